@@ -1,6 +1,39 @@
-from bubbletools import converter as convert
-from bubbletools.validator import validate
-from bubbletools.bbltree import BubbleTree
+"""Tools around the bubble format.
+
+Submodules are imported on first access (PEP 562), so that
+each command only pays the imports it uses.
+
+"""
+
+import sys
+import importlib
 
 
 __version__ = '0.6.12.dev0'
+
+# public name -> (module, attribute in module or None for the module itself)
+_LAZY_ATTRIBUTES = {
+    'convert': ('bubbletools.converter', None),
+    'validate': ('bubbletools.validator', 'validate'),
+    'BubbleTree': ('bubbletools.bbltree', 'BubbleTree'),
+}
+
+
+def __getattr__(name:str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+    module, attribute = _LAZY_ATTRIBUTES[name]
+    value = importlib.import_module(module)
+    if attribute:
+        value = getattr(value, attribute)
+    globals()[name] = value  # next accesses will not call __getattr__
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+if sys.version_info < (3, 7):  # no module __getattr__: import everything now
+    for _name in _LAZY_ATTRIBUTES:
+        __getattr__(_name)
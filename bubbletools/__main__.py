@@ -1,23 +1,41 @@
 """Bubble format related tools
 
 usage:
-    bubble-tool.py validate <bblfile> [--profiling]
+    bubble-tool.py validate <bblfile> [--profiling] [--neighbor-cap=<n>]
     bubble-tool.py dot <bblfile> [<dotfile>] [--render] [--oriented]
     bubble-tool.py gexf <bblfile> [<gexffile>] [--oriented]
-    bubble-tool.py js <bblfile> <directory> [--oriented] [--render] [<style>...]
+    bubble-tool.py js <bblfile> <directory> [--oriented] [--render] [--external-elements] [--gzip] [--max-depth=<n>] [--node-budget=<n>] [--layout=<name>] [<style>...]
+    bubble-tool.py cyjson <bblfile> <jsonfile> [--oriented] [--gzip] [--max-depth=<n>] [--node-budget=<n>] [--layout=<name>] [<style>...]
+    bubble-tool.py edges <bblfile> <outfile> [--oriented]
+    bubble-tool.py compress <edgefile> <bblfile> [--time-budget=<s>]
+    bubble-tool.py batch (validate|dot|gexf|js) <input>... [--outdir=<dir>] [--workers=<n>] [--oriented] [--profiling]
+
+options:
+    --neighbor-cap=<n>  ignore neighbors shared by more than n siblings
+                     when searching mergeable (power)nodes: siblings
+                     sharing only such neighbors are not reported
+    --outdir=<dir>   directory of the output files, default is next to the input files
+    --workers=<n>    number of parallel processes, default is the number of CPUs
+    --external-elements  write the elements in a JSON file fetched by the website
+    --gzip           gzip the JSON elements file
+    --max-depth=<n>  collapse powernodes deeper than n levels in summary nodes
+    --node-budget=<n>  collapse powernodes to show about n (power)nodes at once
+    --layout=<name>  cose-bilkent, computed by the browser, or packing,
+                     precomputed [default: cose-bilkent]
+    --time-budget=<s>  stop the compression after s seconds
 
 """
 
 
-import ast
+import sys
 import docopt
 
-from bubbletools import validator
-from bubbletools import converter
-from bubbletools import utils
+# other modules are imported by the commands using them,
+#  so that short runs do not pay for the imports of unused converters.
 
 
 def read_style_args(args:dict) -> dict:
+    import ast
     def make_value(val):
         try:
             return ast.literal_eval(val)
@@ -28,16 +46,72 @@ def read_style_args(args:dict) -> dict:
     return style_args
 
 
+def read_lod_args(args:dict) -> dict:
+    """Return the level-of-detail options given in CLI args"""
+    return {option: int(args[arg]) if args[arg] else None
+            for option, arg in (('max_depth', '--max-depth'), ('node_budget', '--node-budget'))}
+
+
+def serve_website(directory:str):
+    """Serve given website directory over HTTP on localhost, open it
+    in the default web browser, and serve it until interrupted"""
+    import functools
+    import webbrowser
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=directory)
+    with ThreadingHTTPServer(('localhost', 0), handler) as server:
+        uri = 'http://localhost:{}/index.html'.format(server.server_address[1])
+        print(f'SERVING "{directory}" at {uri}, until interrupted (Ctrl-C)…')
+        webbrowser.open(uri)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def run_batch(args:dict) -> bool:
+    """Run the batch command described by given CLI args, print the
+    per-file timing and failures, and return True if all files succeeded."""
+    import time
+    from bubbletools import batch
+    command = next(cmd for cmd in ('validate', 'dot', 'gexf', 'js') if args[cmd])
+    workers = int(args['--workers']) if args['--workers'] else None
+    start, nb_files, failures = time.perf_counter(), 0, 0
+    results = batch.run_batch(command, args['<input>'], outdir=args['--outdir'],
+                              workers=workers, oriented=args['--oriented'],
+                              profiling=args['--profiling'])
+    for result in results:
+        nb_files += 1
+        if result.error:
+            failures += 1
+            print('FAIL {:.3f}s {}: {}'.format(result.duration, result.bblfile, result.error))
+        else:
+            output = ' -> ' + result.outfile if result.outfile else ''
+            print('OK   {:.3f}s {}{}'.format(result.duration, result.bblfile, output))
+        for log in result.logs:
+            print('    ' + log)
+    print('{} files processed in {:.3f}s, {} failures'.format(
+        nb_files, time.perf_counter() - start, failures))
+    return failures == 0
+
+
 if __name__ == "__main__":
     args = docopt.docopt(__doc__)
 
+    if args['batch']:
+        sys.exit(0 if run_batch(args) else 1)
+
     if args['validate']:
+        from bubbletools import validator
+        neighbor_cap = int(args['--neighbor-cap']) if args['--neighbor-cap'] else None
         logs = validator.validate(args['<bblfile>'],
-                                  profiling=args['--profiling'])
+                                  profiling=args['--profiling'],
+                                  neighbor_cap=neighbor_cap)
         for log in logs:
             print(log)
 
     if args['dot']:
+        from bubbletools import converter
         print('Output file:', converter.bubble_to_dot(
             args['<bblfile>'],
             args['<dotfile>'],
@@ -46,6 +120,7 @@ if __name__ == "__main__":
         ))
 
     if args['gexf']:
+        from bubbletools import converter
         print('Output file:', converter.bubble_to_gexf(
             args['<bblfile>'],
             args['<gexffile>'],
@@ -53,18 +128,57 @@ if __name__ == "__main__":
         ))
 
     if args['js']:
+        from bubbletools import converter
         style_args = read_style_args(args['<style>'])
         print('Output file:', converter.bubble_to_js(
             args['<bblfile>'],
             jsdir=args['<directory>'],
             oriented=args['--oriented'],
+            external_elements=args['--external-elements'],
+            compress=args['--gzip'],
+            layout=args['--layout'],
+            **read_lod_args(args),
             **style_args
         ))
         if args['--render']:
             import os
             import webbrowser
-            single_js_file = os.path.splitext(args['<directory>'])[1] == '.html'
-            uri = os.path.join(os.getcwd(), args['<directory>']
-                               + ('' if single_js_file else '/index.html'))
-            print(f'OPENING "{uri}" in browser…')
-            webbrowser.open(uri)
+            fetching = args['--external-elements'] or any(
+                value is not None for value in read_lod_args(args).values())
+            if fetching:  # browsers don't let pages fetch files under file://
+                serve_website(args['<directory>'])
+            else:
+                single_js_file = os.path.splitext(args['<directory>'])[1] == '.html'
+                uri = os.path.join(os.getcwd(), args['<directory>']
+                                   + ('' if single_js_file else '/index.html'))
+                print(f'OPENING "{uri}" in browser…')
+                webbrowser.open(uri)
+
+    if args['cyjson']:
+        from bubbletools import converter
+        print('Output file:', converter.bubble_to_cyjson(
+            args['<bblfile>'],
+            args['<jsonfile>'],
+            oriented=args['--oriented'],
+            compress=args['--gzip'] or None,
+            layout=args['--layout'],
+            **read_lod_args(args),
+            **read_style_args(args['<style>'])
+        ))
+
+    if args['edges']:
+        from bubbletools import converter
+        print('Output file:', converter.bubble_to_edgelist(
+            args['<bblfile>'],
+            args['<outfile>'],
+            oriented=args['--oriented']
+        ))
+
+    if args['compress']:
+        from bubbletools import converter
+        time_budget = float(args['--time-budget']) if args['--time-budget'] else None
+        print('Output file:', converter.edgelist_to_bubble(
+            args['<edgefile>'],
+            args['<bblfile>'],
+            time_budget=time_budget
+        ))
@@ -0,0 +1,113 @@
+"""Binary snapshot of a BubbleTree, loadable through a memory map.
+
+The file holds a versioned header, the table of (power)node names,
+and the integer arrays of the compact edges and inclusions
+(see _compact module). Loading maps the file in memory and wraps
+its sections without copying or decoding them: names, including
+the ones of the roots, are decoded and the name index is built
+only when needed.
+
+Layout, all sections being aligned on 8 bytes:
+
+    header (see HEADER)
+    name offsets (int64, nb_names + 1) and utf-8 names
+    kinds of ids in edges, then in inclusions (one byte each, nb_names)
+    edges offsets (int64, nb_names + 1) and targets (int32, nb_edge_targets)
+    inclusions offsets (int64, nb_names + 1) and targets (int32, nb_incl_targets)
+    roots (int32, nb_roots)
+
+"""
+
+
+import sys
+import mmap
+import struct
+import itertools as it
+from array import array
+
+from bubbletools._compact import GraphView, NameTable, LazyIndex, id_set
+
+
+MAGIC = b'BBLTREE\0'
+VERSION = 1
+# magic, version, flags, nb names, names bytes, nb edge targets, nb inclusion targets, nb roots
+HEADER = struct.Struct('<8sII5q')
+ORIENTED, SYMMETRIC_EDGES, BIG_ENDIAN = 1, 2, 4  # header flags
+
+
+def _padded(size:int) -> int:
+    """Return given size of a section, padded for alignment on 8 bytes"""
+    return size + (-size % 8)
+
+
+def tree_to_file(tree:'BubbleTree', outfile:str):
+    """Write given tree in given file, in binary format"""
+    tree = tree.compacted()
+    edges, inclusions = tree.edges, tree.inclusions
+    names = inclusions._names
+    encoded = [name.encode() for name in names]
+    name_offsets = array('q', [0])
+    name_offsets.extend(it.accumulate(map(len, encoded)))
+    roots = array('i', sorted(map(inclusions.id_of, tree.roots)))
+    flags = ((ORIENTED if tree.oriented else 0)
+             | (SYMMETRIC_EDGES if tree.symmetric_edges else 0)
+             | (BIG_ENDIAN if sys.byteorder == 'big' else 0))
+    header = HEADER.pack(MAGIC, VERSION, flags, len(names), name_offsets[-1],
+                         len(edges._targets), len(inclusions._targets), len(roots))
+    with open(outfile, 'wb') as fd:
+        for section in (header, name_offsets, b''.join(encoded),
+                        edges._kinds, inclusions._kinds,
+                        edges._offsets, edges._targets,
+                        inclusions._offsets, inclusions._targets, roots):
+            section = memoryview(section).cast('B')
+            fd.write(section)
+            fd.write(bytes(_padded(len(section)) - len(section)))
+
+
+def tree_from_file(infile:str) -> 'BubbleTree':
+    """Return the BubbleTree saved in given binary file"""
+    from bubbletools.bbltree import BubbleTree
+    with open(infile, 'rb') as fd:
+        data = memoryview(mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ))
+    if len(data) < HEADER.size:
+        raise ValueError("File '{}' is not a binary bubble tree".format(infile))
+    magic, version, flags, nb_names, names_size, nb_edge_targets, \
+        nb_incl_targets, nb_roots = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("File '{}' is not a binary bubble tree".format(infile))
+    if version != VERSION:
+        raise ValueError("File '{}' is in version {} of binary bubble tree format,"
+                         " expected {}".format(infile, version, VERSION))
+    sizes = (nb_names, names_size, nb_edge_targets, nb_incl_targets, nb_roots)
+    expected_size = (_padded(HEADER.size) + 3 * _padded(8 * (nb_names + 1))
+                     + _padded(names_size) + 2 * _padded(nb_names)
+                     + _padded(4 * nb_edge_targets) + _padded(4 * nb_incl_targets)
+                     + _padded(4 * nb_roots))
+    if min(sizes) < 0 or len(data) < expected_size:
+        raise ValueError("File '{}' is truncated: its header describes {} bytes,"
+                         " {} found".format(infile, expected_size, len(data)))
+    swap = bool(flags & BIG_ENDIAN) != (sys.byteorder == 'big')
+    position = _padded(HEADER.size)
+    def section(code:str, size:int) -> memoryview or array:
+        "Return the next section, containing size items of given type"
+        nonlocal position
+        nb_bytes = size * struct.calcsize(code)
+        view = data[position:position+nb_bytes]
+        position += _padded(nb_bytes)
+        if swap and code != 'B':  # written on a machine of other endianness
+            view = array(code, view.tobytes())
+            view.byteswap()
+            return view
+        return view.cast(code)
+    name_offsets = section('q', nb_names + 1)
+    names = NameTable(section('B', names_size), name_offsets)
+    index = LazyIndex(names)
+    edge_kinds, incl_kinds = section('B', nb_names), section('B', nb_names)
+    edges = GraphView(names, index, section('q', nb_names + 1),
+                      section('i', nb_edge_targets), edge_kinds)
+    inclusions = GraphView(names, index, section('q', nb_names + 1),
+                           section('i', nb_incl_targets), incl_kinds)
+    roots = id_set(names, index, section('i', nb_roots))
+    return BubbleTree(edges=edges, inclusions=inclusions, roots=roots,
+                      oriented=bool(flags & ORIENTED),
+                      symmetric_edges=bool(flags & SYMMETRIC_EDGES))
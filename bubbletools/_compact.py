@@ -0,0 +1,318 @@
+"""Compact storage of the edges and inclusions of a power graph.
+
+(power)node names are interned as dense integer ids, and each graph
+is stored in CSR layout: the successors of id i are the ids
+targets[offsets[i]:offsets[i+1]], sorted.
+Graphs are exposed as read-only mappings name -> set of names,
+so they can replace the dicts of sets used by BubbleTree.
+
+"""
+
+
+import sys
+import bisect
+import itertools as it
+from array import array
+from collections.abc import Mapping, Sequence, Set
+
+
+# kinds of ids in a graph
+ABSENT = 0  # the name is not a key of the graph
+LEAF = 1  # the name is a key, associated to () (a node in inclusions)
+SET = 2  # the name is a key, associated to a set of names
+
+
+def compact_graphs(edges:dict, inclusions:dict) -> ('GraphView', 'GraphView'):
+    """Return edges and inclusions as GraphView instances sharing
+    the same table of names."""
+    names = list(dict.fromkeys(it.chain(
+        inclusions, it.chain.from_iterable(inclusions.values()),
+        edges, it.chain.from_iterable(edges.values()),
+    )))
+    index = {name: idx for idx, name in enumerate(names)}
+    return (GraphView.from_dict(edges, names, index),
+            GraphView.from_dict(inclusions, names, index))
+
+
+def graphs_from_records(records:iter, symmetric_edges:bool=False) -> ('GraphView', 'GraphView', 'SuccessorsView'):
+    """Return the edges, inclusions and roots described by given records
+    of bubble lines, as given by utils.line_records.
+
+    Names are interned as soon as they are read, and links are kept
+    as pairs of ids in integer arrays until the CSR arrays are built,
+    so no dict of sets is built while parsing.
+
+    symmetric_edges -- add the reversed edges, as utils.completed_graph
+
+    """
+    index, names = {}, []  # name -> id, id -> name
+    def intern(name:str) -> int:
+        "Return the id of given name, created if necessary"
+        idx = index.get(name)
+        if idx is None:
+            idx = index[name] = len(names)
+            names.append(name)
+            kinds.append(ABSENT)
+            included.append(False)
+        return idx
+    kinds = bytearray()  # kinds of the ids in inclusions
+    included = bytearray()  # true for the ids contained by a powernode
+    edge_sources, edge_targets = array('i'), array('i')
+    containers, contents = array('i'), array('i')
+    for line in records:
+        if not line: continue
+        ltype, *payload = line
+        if ltype == 'EDGE':
+            source, target = map(intern, payload)
+            edge_sources.append(source)
+            edge_targets.append(target)
+            if symmetric_edges:
+                edge_sources.append(target)
+                edge_targets.append(source)
+        elif ltype == 'SET':
+            setname = intern(payload[0])
+            if kinds[setname] == ABSENT:
+                kinds[setname] = SET
+        elif ltype == 'NODE':
+            kinds[intern(payload[0])] = LEAF  # a node can't contain anything
+        elif ltype == 'IN':
+            contained, container = map(intern, payload)
+            containers.append(container)
+            contents.append(contained)
+            included[contained] = True
+            if kinds[container] == ABSENT:
+                kinds[container] = SET
+        elif ltype not in {'COMMENT', 'EMPTY', 'ERROR', 'FALSEDGE', 'FALSEPOWEREDGE'}:
+            raise ValueError("The following line is not a valid "
+                             "type ({}): '{}'".format(ltype, payload))
+    # names not in inclusions are used in edges or contained: they are nodes
+    kinds = kinds.replace(bytes((ABSENT,)), bytes((LEAF,)))
+    if any(kinds[container] == LEAF for container in containers):
+        # content of (power)nodes later defined as nodes is dropped
+        kept = [idx for idx, container in enumerate(containers) if kinds[container] != LEAF]
+        containers = array('i', map(containers.__getitem__, kept))
+        contents = array('i', map(contents.__getitem__, kept))
+    offsets, targets = _csr_arrays(len(names), edge_sources, edge_targets)
+    del edge_sources, edge_targets
+    edge_kinds = bytearray(SET if offsets[idx] != offsets[idx+1] else ABSENT
+                           for idx in range(len(names)))
+    edges = GraphView(names, index, offsets, targets, edge_kinds)
+    inclusions = GraphView(names, index, *_csr_arrays(len(names), containers, contents), kinds)
+    roots = id_set(names, index, array('i', (idx for idx, is_in in enumerate(included)
+                                              if not is_in)))
+    return edges, inclusions, roots
+
+
+def _csr_arrays(nb_ids:int, sources:array, targets:array) -> (array, array):
+    """Return the offsets and targets arrays of the graph linking
+    given sources to given targets, without duplicated links"""
+    counts = array('q', bytes(8 * (nb_ids + 1)))
+    for source in sources:
+        counts[source + 1] += 1
+    starts = array('q', it.accumulate(counts))
+    filling = array('q', starts)
+    grouped = array('i', bytes(4 * len(targets)))  # targets, grouped by source
+    for source, target in zip(sources, targets):
+        grouped[filling[source]] = target
+        filling[source] += 1
+    offsets, unique_targets = array('q', [0]), array('i')
+    for idx in range(nb_ids):
+        unique_targets.extend(sorted(set(grouped[starts[idx]:starts[idx+1]])))
+        offsets.append(len(unique_targets))
+    return offsets, unique_targets
+
+
+def id_set(names:Sequence, index:Mapping, ids:array) -> 'SuccessorsView':
+    """Return the read-only set of the names of given sorted ids"""
+    graph = GraphView(names, index, array('q', (0, len(ids))), ids, bytearray((SET,)))
+    return SuccessorsView(graph, 0, len(ids))
+
+
+class GraphView(Mapping):
+    """Read-only mapping name -> set of names, stored as integer arrays.
+
+    names -- list of names, indexed by their id
+    index -- mapping name -> id
+    offsets -- array of len(names)+1 positions in targets
+    targets -- array of ids, successors of each id, sorted
+    kinds -- sequence giving for each id its kind (ABSENT, LEAF or SET)
+
+    """
+    __slots__ = ('_names', '_index', '_offsets', '_targets', '_kinds', '_length')
+
+    def __init__(self, names:list, index:dict, offsets:array, targets:array,
+                 kinds:bytearray):
+        self._names, self._index = names, index
+        self._offsets, self._targets = offsets, targets
+        self._kinds = kinds
+        self._length = None  # computed on time
+
+    @staticmethod
+    def from_dict(graph:dict, names:list, index:dict) -> 'GraphView':
+        """Return the GraphView equivalent to given dict of sets"""
+        offsets, targets = array('q', [0]), array('i')
+        kinds = bytearray(len(names))
+        for idx, name in enumerate(names):
+            succs = graph.get(name)
+            if succs is not None:
+                kinds[idx] = LEAF if succs == () else SET
+                targets.extend(sorted(index[succ] for succ in succs))
+            offsets.append(len(targets))
+        return GraphView(names, index, offsets, targets, kinds)
+
+    def reversed(self) -> 'GraphView':
+        """Return the reversed graph, as utils.reversed_graph would,
+        in time linear with the number of ids and links."""
+        nb_ids, targets = len(self._names), self._targets
+        counts = array('q', bytes(8 * (nb_ids + 1)))
+        for target in targets:
+            counts[target + 1] += 1
+        offsets = array('q', it.accumulate(counts))
+        filling = array('q', offsets)
+        reversed_targets = array('i', bytes(4 * len(targets)))
+        for source in range(nb_ids):  # sources are walked in order: sorted results
+            for target in targets[self._offsets[source]:self._offsets[source+1]]:
+                reversed_targets[filling[target]] = source
+                filling[target] += 1
+        kinds = bytearray(SET if counts[idx + 1] else ABSENT for idx in range(nb_ids))
+        return GraphView(self._names, self._index, offsets, reversed_targets, kinds)
+
+    def id_of(self, name) -> int:
+        """Return the integer id of given name"""
+        return self._index[name]
+
+    def successor_ids(self, idx:int) -> array:
+        """Return the sorted ids of the successors of given id"""
+        return self._targets[self._offsets[idx]:self._offsets[idx+1]]
+
+    def __getitem__(self, name) -> Set or tuple:
+        idx = self._index[name]
+        kind = self._kinds[idx]
+        if kind == ABSENT:
+            raise KeyError(name)
+        if kind == LEAF:
+            return ()
+        return SuccessorsView(self, self._offsets[idx], self._offsets[idx+1])
+
+    def __contains__(self, name) -> bool:
+        idx = self._index.get(name)
+        return idx is not None and self._kinds[idx] != ABSENT
+
+    def __iter__(self) -> iter:
+        names = self._names
+        return (names[idx] for idx, kind in enumerate(self._kinds) if kind != ABSENT)
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = len(self._kinds) - bytes(self._kinds).count(ABSENT)
+        return self._length
+
+    def nbytes(self, with_names:bool=True) -> int:
+        """Return an estimate of the memory used by the graph, in bytes.
+
+        with_names -- count the names and their index, that may be shared
+                      with another graph
+
+        """
+        size = sum(memoryview(buffer).nbytes for buffer in
+                   (self._offsets, self._targets, self._kinds))
+        if with_names:
+            if isinstance(self._names, NameTable):
+                size += self._names.nbytes
+            else:
+                size += sys.getsizeof(self._names) + sum(map(sys.getsizeof, self._names))
+            index = self._index
+            if isinstance(index, LazyIndex):
+                index = index._index  # None until the first lookup
+            if index is not None:
+                size += sys.getsizeof(index)
+        return size
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(type(self).__name__, dict(self.items()))
+
+
+class NameTable(Sequence):
+    """Sequence of names, decoded on demand from a buffer of utf-8 names
+    and the array of their offsets in it."""
+    __slots__ = ('_blob', '_offsets')
+
+    def __init__(self, blob:memoryview, offsets:array):
+        self._blob, self._offsets = blob, offsets
+
+    def __getitem__(self, idx:int) -> str:
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return str(self._blob[self._offsets[idx]:self._offsets[idx+1]], 'utf-8')
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the encoded names and of their offsets, in bytes"""
+        return self._blob.nbytes + memoryview(self._offsets).nbytes
+
+
+class LazyIndex(Mapping):
+    """Mapping name -> id of given names, built at first lookup"""
+    __slots__ = ('_names', '_index')
+
+    def __init__(self, names:Sequence):
+        self._names, self._index = names, None
+
+    @property
+    def index(self) -> dict:
+        if self._index is None:
+            self._index = {name: idx for idx, name in enumerate(self._names)}
+        return self._index
+
+    def __getitem__(self, name) -> int:
+        return self.index[name]
+
+    def get(self, name, default=None):
+        return self.index.get(name, default)
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def __iter__(self) -> iter:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class SuccessorsView(Set):
+    """Read-only set of the names of the successors of an id in a GraphView"""
+    __slots__ = ('_graph', '_start', '_stop')
+
+    def __init__(self, graph:GraphView, start:int, stop:int):
+        self._graph, self._start, self._stop = graph, start, stop
+
+    @classmethod
+    def _from_iterable(cls, iterable:iter) -> frozenset:
+        """Build the results of set operations"""
+        return frozenset(iterable)
+
+    def ids(self) -> array:
+        """Return the sorted ids of the names in the set"""
+        return self._graph._targets[self._start:self._stop]
+
+    def __contains__(self, name) -> bool:
+        idx = self._graph._index.get(name)
+        if idx is None:
+            return False
+        targets = self._graph._targets
+        pos = bisect.bisect_left(targets, idx, self._start, self._stop)
+        return pos < self._stop and targets[pos] == idx
+
+    def __iter__(self) -> iter:
+        names = self._graph._names
+        return (names[idx] for idx in self.ids())
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(type(self).__name__, set(self))
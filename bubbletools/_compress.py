@@ -0,0 +1,189 @@
+"""Compression of a graph into a power graph, by greedy merging of twins.
+
+Nodes are interned as integers. The (power)nodes contained by nothing
+are indexed by the hash of their neighborhood, and each group of twins
+is merged into a new powernode, linked to their common neighbors:
+
+- (power)nodes with the same neighbors are either pairwise independent,
+  or pairwise linked and all linked to themselves. In the second case,
+  the new powernode is linked to itself.
+- (power)nodes with the same neighbors once themselves included
+  are a clique. As a poweredge linking a powernode to itself
+  would link each node to itself, the clique is split in two halves
+  linked by a poweredge, each half being split the same way.
+
+Merges are repeated until no twins are found, or until the time budget
+is spent. Only the (power)nodes whose neighborhood changed are hashed
+again at each round. Compression is lossless: the decompressed graph
+is the given one.
+
+"""
+
+
+import time
+import itertools as it
+from collections import defaultdict
+
+
+POWERNODE_NAME = 'p{}'
+
+
+def compress(edges:iter, nodes:iter=(), time_budget:float=None) -> (dict, dict, frozenset):
+    """Return the edges, inclusions and roots of a power graph
+    compressing the undirected graph of given edges.
+
+    edges -- iterable of (node, node) pairs
+    nodes -- other nodes of the graph, linked to nothing
+    time_budget -- number of seconds after which no new merge round is started
+
+    """
+    start = time.perf_counter()
+    ids, names = {}, []  # node name -> id, id -> node name
+    given_ids = {}  # node as given -> id, avoiding the conversion of known nodes
+    adjacency = defaultdict(set)  # (power)node id -> linked (power)node ids
+    def intern(node) -> int:
+        "Return the id of given node, created if necessary"
+        name = str(node)
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        given_ids[node] = ids[name]
+        return ids[name]
+    for node in nodes:
+        intern(node)
+    for source, target in edges:
+        source = given_ids[source] if source in given_ids else intern(source)
+        target = given_ids[target] if target in given_ids else intern(target)
+        adjacency[source].add(target)
+        adjacency[target].add(source)
+    merger = _TwinMerger(adjacency, len(names))
+    while merger.dirty and (time_budget is None or time.perf_counter() - start < time_budget):
+        merger.merge_round()
+
+    # name the powernodes, avoiding the node names
+    counter = it.count(1)
+    for _ in merger.inclusions:
+        name = next(POWERNODE_NAME.format(idx) for idx in counter
+                    if POWERNODE_NAME.format(idx) not in ids)
+        names.append(name)
+    inclusions = {name: () for name in names[:merger.nb_nodes]}
+    for powernode, content in merger.inclusions.items():
+        inclusions[names[powernode]] = {names[sub] for sub in content}
+    named_edges = defaultdict(set)
+    for source, targets in it.chain(adjacency.items(), merger.inner_edges.items()):
+        if targets:
+            named_edges[names[source]].update(names[target] for target in targets)
+    roots = frozenset(names[root] for root in merger.roots)
+    return dict(named_edges), inclusions, roots
+
+
+class _TwinMerger:
+    """Merge the twins of a graph, round after round.
+
+    adjacency -- mapping (power)node id -> linked (power)node ids,
+                 modified in place, and giving the poweredges
+                 between the roots at the end
+    nb_nodes -- number of nodes, ids of the powernodes following them
+
+    """
+
+    def __init__(self, adjacency:dict, nb_nodes:int):
+        self.adjacency = adjacency
+        self.nb_nodes = nb_nodes
+        self.inclusions = {}  # powernode id -> contained (power)node ids
+        self.inner_edges = defaultdict(set)  # poweredges between the halves of cliques
+        self.roots = set(range(nb_nodes))
+        self.dirty = set(self.roots)  # roots whose neighborhood must be hashed
+        # neighborhood -> roots having it, and root -> its neighborhood
+        self.open_index, self.open_keys = defaultdict(set), {}
+        # same with the root included in its neighborhood, for roots not linked to themselves
+        self.closed_index, self.closed_keys = defaultdict(set), {}
+
+    def merge_round(self) -> int:
+        """Merge all groups of twins including a dirty root,
+        and return the number of merged groups"""
+        open_keys, closed_keys = set(), set()
+        for root in self.dirty:
+            _unindex(root, self.open_index, self.open_keys)
+            _unindex(root, self.closed_index, self.closed_keys)
+            if root not in self.roots:
+                continue
+            neighbors = self.adjacency.get(root, ())
+            if neighbors:  # nodes linked to nothing are not merged
+                key = frozenset(neighbors)
+                self.open_index[key].add(root)
+                self.open_keys[root] = key
+                open_keys.add(key)
+            if root not in neighbors:
+                key = frozenset(neighbors).union((root,))
+                self.closed_index[key].add(root)
+                self.closed_keys[root] = key
+                closed_keys.add(key)
+        self.dirty = set()
+        groups = [tuple(self.open_index[key]) for key in open_keys
+                  if len(self.open_index[key]) > 1]
+        # a clique of two nodes linked to nothing else can't be compressed
+        groups.extend(tuple(self.closed_index[key]) for key in closed_keys
+                      if len(self.closed_index[key]) > 1 and len(key) > 2)
+        for group in groups:  # twins of a group stay twins after the merge of the others
+            self.merge(group)
+        return len(groups)
+
+    def merge(self, group:tuple):
+        """Replace given twins by a new powernode containing them"""
+        members = frozenset(group)
+        neighbors = self.adjacency[group[0]]
+        self_linked = group[0] in neighbors  # all members are linked together
+        clique = not self_linked and not members.isdisjoint(neighbors)
+        external = neighbors - members
+        powernode = self.new_powernode(group)
+        if clique:
+            self.split_clique(powernode, group)
+        for member in group:
+            del self.adjacency[member]
+        for neighbor in external:
+            linked = self.adjacency[neighbor]
+            linked -= members
+            linked.add(powernode)
+        self.adjacency[powernode] = set(external)
+        if self_linked:
+            self.adjacency[powernode].add(powernode)
+        self.roots -= members
+        self.roots.add(powernode)
+        self.dirty |= members
+        self.dirty |= external
+        self.dirty.add(powernode)
+
+    def new_powernode(self, content:iter) -> int:
+        """Return the id of a new powernode containing given (power)nodes"""
+        powernode = self.nb_nodes + len(self.inclusions)
+        self.inclusions[powernode] = set(content)
+        return powernode
+
+    def split_clique(self, powernode:int, members:tuple):
+        """Replace the content of given powernode, a clique of given members,
+        by two halves linked together, each half being split the same way"""
+        stack = [(powernode, members)]
+        while stack:
+            container, members = stack.pop()
+            halves = []
+            for half in (members[:len(members)//2], members[len(members)//2:]):
+                if len(half) > 1:
+                    sub = self.new_powernode(half)
+                    stack.append((sub, half))
+                    halves.append(sub)
+                else:
+                    halves.append(half[0])
+            self.inclusions[container] = set(halves)
+            first, second = halves
+            self.inner_edges[first].add(second)
+            self.inner_edges[second].add(first)
+
+
+def _unindex(root:int, index:dict, keys:dict):
+    """Remove given root from given index of neighborhoods"""
+    key = keys.pop(root, None)
+    if key is not None:
+        index[key].discard(root)
+        if not index[key]:
+            del index[key]
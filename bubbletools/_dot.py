@@ -0,0 +1,95 @@
+"""Conversion from a powergraph tree to a dot representation,
+written directly, without building graphviz objects.
+
+Each powernode is a cluster, holding an invisible point named
+after the powernode, so that edges can link clusters
+using the ltail and lhead attributes of compound graphs.
+
+"""
+
+
+import re
+
+
+DOT_HEADER = '{} "graph" {{\n\tgraph [compound=true]\n'
+DOT_CLUSTER_ATTRS = ('color=lightgrey', 'label=""', 'shape=ellipse',
+                     'penwidth=2', 'pencolor=black')
+DOT_KEYWORDS = frozenset(('node', 'edge', 'graph', 'digraph', 'subgraph', 'strict'))
+BUFFER_SIZE = 2 ** 20  # size of the output buffer, in bytes
+
+_ID_REGEX = re.compile(r'^(?:[a-zA-Z_\u0080-\U0010ffff][a-zA-Z_0-9\u0080-\U0010ffff]*'
+                       r'|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))$')
+
+
+def quote(name:str) -> str:
+    """Return given name as a dot identifier, quoted if necessary.
+
+    >>> quote('p1'), quote('-1.5'), quote('graph'), quote('a b'), quote('"d"')
+    ('p1', '-1.5', '"graph"', '"a b"', '"\\\\"d\\\\""')
+
+    """
+    name = str(name)
+    if _ID_REGEX.match(name) and name.lower() not in DOT_KEYWORDS:
+        return name
+    return '"{}"'.format(name.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def tree_to_file(tree:'BubbleTree', outfile:str):
+    """Compute the dot representation of given power graph,
+    and push it into given file.
+
+    Lines are written as soon as they are computed,
+    so the document is never held in memory.
+
+    """
+    with open(outfile, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as fd:
+        fd.writelines(dot_lines(tree))
+
+
+def tree_to_dot(tree:'BubbleTree') -> str:
+    """Compute the dot representation of given power graph,
+    and return it as a string."""
+    return ''.join(dot_lines(tree))
+
+
+def dot_lines(tree:'BubbleTree') -> iter:
+    """Yield the lines, newline included, of the dot representation
+    of given power graph.
+
+    """
+    yield DOT_HEADER.format('digraph' if tree.oriented else 'graph')
+
+    # build full hierarchy from the roots, in a depth-first walk
+    depth = 1
+    for node, entering in tree.depth_first():
+        if tree.is_powernode(node):
+            if entering:
+                indent = '\t' * depth
+                yield '{}subgraph {} {{\n'.format(indent, quote('cluster_' + node))
+                depth += 1
+                indent += '\t'
+                yield '{}{} [shape=point style=invis]\n'.format(indent, quote(node))
+                for attr in DOT_CLUSTER_ATTRS:
+                    yield indent + attr + '\n'
+            else:
+                depth -= 1
+                yield '\t' * depth + '}\n'
+        elif entering:  # it's a regular node
+            yield '\t' * depth + quote(node) + '\n'
+
+    # add the edges to the final graph
+    # symmetric edges dict is complete: keep one direction to avoid multiple edges.
+    keep_all = tree.oriented or not tree.symmetric_edges
+    link = ' -> ' if tree.oriented else ' -- '
+    for source, targets in tree.edges.items():
+        for target in targets:
+            if keep_all or source <= target:
+                attrs = []
+                if tree.is_powernode(target):
+                    attrs.append('lhead=' + quote('cluster_' + target))
+                if tree.is_powernode(source):
+                    attrs.append('ltail=' + quote('cluster_' + source))
+                yield '\t{}{}{}{}\n'.format(quote(source), link, quote(target),
+                                            ' [{}]'.format(' '.join(attrs)) if attrs else '')
+
+    yield '}\n'
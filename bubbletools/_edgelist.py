@@ -0,0 +1,179 @@
+"""Decompression of a powergraph tree into the edges of the initial graph.
+
+Nodes are given integer ids. When inclusions are a tree, ids follow
+a depth-first walk, so that the nodes of any powernode are a block
+of consecutive ids: the neighbors of a node are then the disjoint ranges
+of ids of the maximal (power)nodes linked to it or to its ancestors,
+expanded without any deduplication. With overlapping powernodes,
+the sorted arrays of ids of the linked (power)nodes are merged,
+once per distinct set of links.
+
+Edges are written as a TSV edge list by chunks, or as the arrays
+of a CSR adjacency matrix, wrapped in scipy.sparse when available.
+TSV edge lists can be read back, for instance to be compressed again.
+
+"""
+
+
+import io
+import gzip
+import bisect
+import functools
+from array import array
+
+
+BUFFER_SIZE = 2 ** 20  # size of the output buffer, in bytes
+CHUNK_SIZE = 2 ** 14  # number of lines built at once
+NEIGHBORHOOD_CACHE_SIZE = 1024  # number of neighborhoods kept with overlapping powernodes
+
+
+def neighbor_blocks(tree:'BubbleTree') -> (tuple, iter):
+    """Return the names of the nodes, indexed by their id, and a generator
+    of (node id, blocks of neighbor ids) for each node, by increasing id.
+
+    Blocks are sorted sequences of ids, disjoint and sorted between them.
+    Neighbors are the successors when the tree is oriented.
+
+    """
+    graph = tree.edges if tree.oriented else tree.links
+    if tree.intervals is None:  # overlapping powernodes or inclusion cycles
+        names = tuple(tree.nodes())
+        ids = {name: idx for idx, name in enumerate(names)}
+        @functools.lru_cache(maxsize=NEIGHBORHOOD_CACHE_SIZE)
+        def neighbors(linked:frozenset) -> array:
+            "Return the sorted ids of the nodes in given (power)nodes"
+            nodes = set().union(*(tree.leaves(other) if tree.is_powernode(other) else (other,)
+                                  for other in linked))
+            return array('i', sorted(map(ids.__getitem__, nodes)))
+        blocks = ((ids[node], (neighbors(linked),))
+                  for node, _, linked in tree._overlapping_links(graph))
+        return names, blocks
+    names, first = [], {}  # first: (power)node -> id of its first node
+    for name in tree.preorder():
+        first[name] = len(names)
+        if tree.is_node(name):
+            names.append(name)
+    blocks = ((first[node], tuple(range(first[other], first[other] + tree._node_count(other))
+                                  for *_, other in maximals))
+              for node, maximals, _, _ in tree._laminar_links(graph))
+    return tuple(names), blocks
+
+
+def edges(tree:'BubbleTree') -> iter:
+    """Yield the edges of the initial graph, as pairs of node names.
+
+    Each edge is yielded once: (u, v) and (v, u) are
+    the same edge if the tree is not oriented.
+
+    """
+    names, blocks = neighbor_blocks(tree)
+    for source, targets in _unique_blocks(tree, blocks):
+        name = names[source]
+        for block in targets:
+            for target in block:
+                yield name, names[target]
+
+
+def _unique_blocks(tree:'BubbleTree', blocks:iter) -> iter:
+    """Yield given (node id, blocks of neighbor ids), keeping only
+    the neighbors of greater or equal id if the tree is not oriented"""
+    if tree.oriented:
+        yield from blocks
+        return
+    for source, targets in blocks:
+        yield source, tuple(block[bisect.bisect_left(block, source):] for block in targets)
+
+
+def tree_to_file(tree:'BubbleTree', outfile:str, compress:bool=None):
+    """Write the edges of the initial graph in given file,
+    one tab-separated pair of node names per line.
+
+    Lines are written by chunks as soon as they are computed,
+    so the edge list is never held in memory.
+    compress -- gzip the file. Default is to do it if outfile ends with .gz
+
+    """
+    if compress is None:
+        compress = outfile.endswith('.gz')
+    names, blocks = neighbor_blocks(tree)
+    with _open_output(outfile, compress) as fd:
+        for source, targets in _unique_blocks(tree, blocks):
+            prefix = names[source] + '\t'
+            separator = '\n' + prefix
+            for block in targets:
+                for start in range(0, len(block), CHUNK_SIZE):
+                    chunk = block[start:start+CHUNK_SIZE]
+                    fd.write(prefix + separator.join(map(names.__getitem__, chunk)) + '\n')
+
+
+def _open_output(outfile:str, compress:bool) -> io.TextIOBase:
+    """Return a buffered text stream writing in given file, gzipped or not"""
+    if compress:
+        return io.TextIOWrapper(io.BufferedWriter(gzip.open(outfile, 'wb'), BUFFER_SIZE),
+                                encoding='utf-8')
+    return open(outfile, 'w', encoding='utf-8', buffering=BUFFER_SIZE)
+
+
+def edges_from_file(infile:str) -> iter:
+    """Yield the pairs of node names found in given TSV edge list,
+    gzipped if its name ends with .gz.
+
+    Fields after the second one are ignored, as well as empty lines
+    and lines starting with #.
+
+    """
+    opener = gzip.open if infile.endswith('.gz') else open
+    with opener(infile, 'rt', encoding='utf-8') as fd:
+        for line in fd:
+            if line.startswith('#') or not line.strip():
+                continue
+            source, target, *_ = line.rstrip('\n').split('\t')
+            yield source, target
+
+
+def csr_arrays(tree:'BubbleTree') -> (tuple, array, array):
+    """Return the names of the nodes, indexed by their id, and the row
+    offsets and column ids of the CSR adjacency matrix of the initial graph.
+
+    The matrix is symmetric if the tree is not oriented.
+
+    """
+    names, blocks = neighbor_blocks(tree)
+    indptr, indices = array('q', [0]), array('i')
+    for _, targets in blocks:
+        for block in targets:
+            indices.extend(block)
+        indptr.append(len(indices))
+    return names, indptr, indices
+
+
+def tree_to_csr(tree:'BubbleTree') -> (tuple, 'scipy.sparse.csr_matrix'):
+    """Return the names of the nodes, indexed by their id, and the boolean
+    CSR adjacency matrix of the initial graph.
+
+    Needs the numpy and scipy packages.
+
+    """
+    import numpy
+    from scipy import sparse
+    names, indptr, indices = csr_arrays(tree)
+    indices = numpy.frombuffer(indices, dtype=numpy.dtype('i'))
+    indptr = numpy.frombuffer(indptr, dtype=numpy.dtype('q'))
+    data = numpy.ones(len(indices), dtype=bool)
+    return names, sparse.csr_matrix((data, indices, indptr), shape=(len(names), len(names)))
+
+
+def tree_to_npz(tree:'BubbleTree', outfile:str):
+    """Write in given file the CSR adjacency matrix of the initial graph,
+    readable by scipy.sparse.load_npz, with the node names
+    indexed by their id under the 'names' key.
+
+    Needs the numpy and scipy packages.
+
+    """
+    import numpy
+    names, matrix = tree_to_csr(tree)
+    numpy.savez_compressed(outfile, format=matrix.format.encode('ascii'),
+                           shape=matrix.shape, data=matrix.data,
+                           indices=matrix.indices, indptr=matrix.indptr,
+                           names=numpy.array(names, dtype=str))
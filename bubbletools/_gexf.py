@@ -1,61 +1,79 @@
 """Conversion from a powergraph tree to a gexf representation"""
 
 
-GEXF_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+from xml.sax.saxutils import escape
+
+
+GEXF_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
 <gexf xmlns="http://www.gexf.net/1.2draft" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.gexf.net/1.2draft http://www.gexf.net/1.2draft/gexf.xsd" version="1.2">
      <graph mode="static" defaultedgetype="{}">
         <nodes>
-            {}
-        </nodes>
+"""
+GEXF_MIDDLE = """        </nodes>
         <edges>
-            {}
-        </edges>
+"""
+GEXF_FOOTER = """        </edges>
     </graph>
 </gexf>
 """
+BUFFER_SIZE = 2 ** 20  # size of the output buffer, in bytes
 
 
 def tree_to_file(tree:'BubbleTree', outfile:str):
     """Compute the gexf representation of given power graph,
-    and push it into given file."""
-    with open(outfile, 'w') as fd:
-        fd.write(tree_to_gexf(tree))
+    and push it into given file.
+
+    Lines are written as soon as they are computed,
+    so the document is never held in memory.
+
+    """
+    with open(outfile, 'w', buffering=BUFFER_SIZE) as fd:
+        fd.writelines(gexf_lines(tree))
 
 
 def tree_to_gexf(tree:'BubbleTree') -> str:
     """Compute the gexf representation of given power graph,
-    and push it into given file.
+    and return it as a string.
 
     See https://gephi.org/gexf/format/index.html
     for format doc.
 
     """
-    output_nodes, output_edges = '', ''
+    return ''.join(gexf_lines(tree))
 
-    def build_node(node:str) -> str:
-        """Yield strings describing given node, recursively"""
+
+def gexf_lines(tree:'BubbleTree') -> iter:
+    """Yield the lines, newline included, of the gexf representation
+    of given power graph.
+
+    """
+    def attr(value:str) -> str:
+        """Return given value escaped for use in a XML attribute"""
+        return escape(str(value), {'"': '&quot;'})
+
+    yield GEXF_HEADER.format('directed' if tree.oriented else 'undirected')
+
+    # build full hierarchy from the roots, in a depth-first walk
+    for node, entering in tree.depth_first():
         if tree.inclusions[node]:  # it's a powernode
-            yield '<node id="{}" label="{}">'.format(node, node)
-            yield '<nodes>'
-            for sub in tree.inclusions[node]:
-                yield from build_node(sub)
-            yield '</nodes>'
-            yield '</node>'
-        else:  # it's a regular node
-            yield '<node id="{}" label="{}"/>'.format(node, node)
-        return
-
-    # build full hierarchy from the roots
-    output_nodes += '\n'.join('\n'.join(build_node(root)) for root in tree.roots)
-
-    # # add the edges to the final graph
-    for idx, (source, targets) in enumerate(tree.edges.items()):
+            if entering:
+                yield '<node id="{0}" label="{0}">\n<nodes>\n'.format(attr(node))
+            else:
+                yield '</nodes>\n</node>\n'
+        elif entering:  # it's a regular node
+            yield '<node id="{0}" label="{0}"/>\n'.format(attr(node))
+
+    yield GEXF_MIDDLE
+
+    # add the edges to the final graph
+    # symmetric edges dict is complete: keep one direction to avoid multiple edges.
+    keep_all = tree.oriented or not tree.symmetric_edges
+    idx = 0
+    for source, targets in tree.edges.items():
         for target in targets:
-            if source <= target:  # edges dict is complete. This avoid multiple edges.
-                output_edges += '<edge id="{}" source="{}" target="{}" />\n'.format(idx, source, target)
-
-    return GEXF_TEMPLATE.format(
-        'directed' if tree.oriented else 'undirected',
-        output_nodes,
-        output_edges
-    )
+            if keep_all or source <= target:
+                yield '<edge id="{}" source="{}" target="{}" />\n'.format(
+                    idx, attr(source), attr(target))
+                idx += 1
+
+    yield GEXF_FOOTER
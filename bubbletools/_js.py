@@ -13,115 +13,470 @@ TODO:
 
 """
 
+import io
 import os
 import sys
+import gzip
+import json
 import shutil
 import itertools
-import pkg_resources
+from collections import defaultdict, deque, namedtuple
 from bubbletools import utils
 from bubbletools.bbltree import BubbleTree
-from bubbletools.utils import reversed_graph
-from bubbletools._js_data import (JS_HEADER, JS_MIDDLE, JS_FOOTER, JS_NODE_LINE,
-                                  JS_EDGE_LINE, JS_FALSEDGE_LINE,
+from bubbletools.cache import ParseCache
+from bubbletools._layout import circle_packing
+from bubbletools._js_data import (JS_HEADER, JS_MIDDLE, JS_ELEMENT_LINE,
+                                  JS_CYTOSCAPE, JS_LAYOUT, JS_FETCH_HEADER,
+                                  JS_FETCH_FOOTER, JS_FETCHED_ELEMENTS,
+                                  JS_EXPAND_CALLBACKS, JS_ELEMENTS_END,
+                                  JS_PRESET_LAYOUT,
                                   JS_MOUSEOVER_SHOW_CALLBACKS,
                                   JS_MOUSEOVER_WIDTH_CALLBACKS)
 
 
-def bbl_to_cys(bblfile:str, oriented:bool=False, width_as_cover:bool=True,
-               show_cover:str='cover: {}', false_edge_on_hover:bool=True,
-               default_poweredge_width:int=5):
-    """Yield lines of js to write in output file"""
-    # False edges in clique
-    with open(bblfile) as fd:
-        falsedges = tuple(
-            (src, trg) for _, src, trg in
-            (l.strip().split('\t') for l in fd if l.startswith('FALSEDGE'))
-        )
-    if false_edge_on_hover:
-        nodes_in_false_edges = set(itertools.chain.from_iterable(falsedges))
-    # Detect incomplete power edges
-    with open(bblfile) as fd:
-        falsepoweredges = {}
-        for line in fd:
-            if line.startswith('FALSEPOWEREDGE'):
-                _, seta, setb, src, trg = line.strip().split('\t')
-                falsepoweredges.setdefault(frozenset((seta, setb)), set()).add((src, trg))
-                if false_edge_on_hover:
-                    nodes_in_false_edges.add(src)
-                    nodes_in_false_edges.add(trg)
-
-    # Build node hierarchy
-    tree = BubbleTree.from_bubble_file(bblfile, symmetric_edges=False, oriented=oriented)
-    def isclique(node): return node in tree.edges.get(node, ())
-    def handle_node(node, parent=None):
-        clique = isclique(node)
-        if false_edge_on_hover and clique:
-            falsedges = ((src, trg) for src, trg in itertools.combinations(tuple(tree.nodes_in(node)), r=2)
-                         if src in nodes_in_false_edges and trg in nodes_in_false_edges)
-        else: falsedges = ()
-        return JS_NODE_LINE(node, parent, clique=clique, falsedges=falsedges)
+BUFFER_SIZE = 2 ** 20  # size of the output buffers, in bytes
+ELEMENTS_FILE = 'elements.json'  # name of the elements file in website directory
+# website template, shipped as package data (package is not zip safe)
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_js_dir_template')
+LAYOUTS = ('cose-bilkent', 'packing')  # computed by the browser, or precomputed
 
-    yield from JS_HEADER
 
+def read_bubble(bblfile:str, oriented:bool=False, cache:ParseCache=None) -> (BubbleTree, list, dict):
+    """Return the tree depicted by given bubble file, the false edges
+    in cliques, and the map incomplete power edge -> false edges.
+
+    cache -- a ParseCache used to get the parsed bubble file
+
+    """
+    # One pass over the file: extended lines are kept aside,
+    #  others are used to build the node hierarchy.
+    if cache is None:
+        false_records = []
+        records = utils.split_false_edges(utils.file_records(bblfile), false_records)
+        tree = BubbleTree.from_bubble_data(records, symmetric_edges=False, oriented=oriented)
+    else:  # false edges are kept in cache with the tree
+        tree, false_records = cache.get_parsed(bblfile, symmetric_edges=False, oriented=oriented)
+    falsedges = []  # false edges in clique
+    falsepoweredges = {}  # incomplete power edges -> false edges
+    for record in false_records:
+        if record[0] == 'FALSEDGE':
+            falsedges.append(record[1:])
+        else:  # FALSEPOWEREDGE
+            _, seta, setb, src, trg = record
+            falsepoweredges.setdefault(frozenset((seta, setb)), set()).add((src, trg))
+    return tree, falsedges, falsepoweredges
+
+
+def find_clique_falsedges(tree:BubbleTree, falsedges:iter) -> dict:
+    """Return the mapping clique -> false edges inside it.
+
+    Each false edge is attributed to the smallest clique containing
+    both ends, found by walking up the ancestors of the source.
+
+    """
+    clique_falsedges = defaultdict(list)
+    for src, trg in falsedges:
+        if trg not in tree.inclusions:  # unknown target, in no clique
+            continue
+        for ancestor in tree.ancestors(src):
+            if ancestor in tree.edges.get(ancestor, ()) and tree.is_in(trg, ancestor):
+                clique_falsedges[ancestor].append([src, trg])
+                break
+    return clique_falsedges
+
+
+def node_element(tree:BubbleTree, node, parent=None, clique_falsedges:dict={}) -> dict:
+    """Return the cytoscape element of given (power)node"""
+    data = {'id': node}
+    if parent is not None:
+        data['parent'] = parent
+    if node in tree.edges.get(node, ()):  # it's a clique
+        data['type'] = 'clique'
+        if node in clique_falsedges:
+            data['falsedges'] = clique_falsedges[node]
+    return {'group': 'nodes', 'data': data}
+
+
+def edge_element(source, target, ispower:bool, cover:int=None,
+                 width_as_cover:bool=True, show_cover:str='cover: {}',
+                 default_poweredge_width:int=5) -> dict:
+    """Return the cytoscape element of given (power) edge,
+    covering given number of edges if not None."""
+    element = {'group': 'edges', 'data': {'source': source, 'target': target}}
+    data = element['data']
+    if cover is not None:
+        data['width'] = 2 + cover if width_as_cover else default_poweredge_width
+        if cover > 1 and show_cover:  # it's a power edge
+            data['label'] = show_cover.format(cover)
+            element['classes'] = 'autorotate'
+    if ispower:
+        data['type'] = 'poweredge'
+    return element
+
+
+def cys_elements(tree:BubbleTree, falsedges:iter=(), falsepoweredges:dict={},
+                 width_as_cover:bool=True, show_cover:str='cover: {}',
+                 false_edge_on_hover:bool=True, default_poweredge_width:int=5) -> iter:
+    """Yield the cytoscape elements, as dicts in cytoscape JSON format,
+    of given tree: all nodes, then all edges."""
+    clique_falsedges = find_clique_falsedges(tree, falsedges) if false_edge_on_hover else {}
     for node in tree.roots:
-        yield handle_node(node)
-        yield JS_NODE_LINE(node, clique=isclique(node))
-    parents = reversed_graph(tree.inclusions)  # (power)node -> direct parent
-    for node, parents in parents.items():
+        yield node_element(tree, node, clique_falsedges=clique_falsedges)
+    for node, parents in tree.parents.items():  # (power)node -> direct parent
         assert len(parents) == 1, {node: parents}
-        yield handle_node(node, parent=next(iter(parents)))
-
-    yield from JS_MIDDLE
+        yield node_element(tree, node, next(iter(parents)), clique_falsedges)
 
     use_cover = width_as_cover or show_cover
-    if use_cover:
-        def coverof(source, target) -> int:
-            source_cover = sum(1 for _ in tree.nodes_in(source))
-            target_cover = sum(1 for _ in tree.nodes_in(target))
-            return (source_cover or 1) * (target_cover or 1)
-        def labelof(cover:int) -> str or None:
-            if cover > 1:  # it's a power edge
-                return show_cover.format(cover)
     # Now, (power) edges
     powernodes = frozenset(tree.powernodes())
     for source, targets in tree.edges.items():
         for target in targets:
             if target == source:  continue  # cliques are not handled this way
-            label, attrs, isreflexive = None, {}, False
+            cover = coverof(tree, source, target) if use_cover else None
             ispower = source in powernodes or target in powernodes
-            if use_cover:
-                cover = coverof(source, target)
-                label, attrs = labelof(cover), {'width': 2+cover if width_as_cover else default_poweredge_width}
+            element = edge_element(source, target, ispower, cover, width_as_cover,
+                                   show_cover, default_poweredge_width)
             if ispower and frozenset((source, target)) in falsepoweredges:
-                attrs['falsedges'] = list(map(list, falsepoweredges[frozenset((source, target))]))
-            yield ' '*8 + JS_EDGE_LINE(source, target, ispower, label=label, attrs=attrs)
+                element['data']['falsedges'] = sorted(map(list, falsepoweredges[frozenset((source, target))]))
+            yield element
 
     # If asked so, add false edges in the file as regular edges
     if not false_edge_on_hover:
-        for source, target in falsedges:
-            yield ' '*8 + JS_FALSEDGE_LINE(source, target)
-        for edges in falsepoweredges.values():
-            for source, target in edges:
-                yield ' '*8 + JS_FALSEDGE_LINE(source, target)
+        for source, target in itertools.chain(falsedges, *falsepoweredges.values()):
+            yield {'group': 'edges', 'data': {'source': source, 'target': target, 'type': 'falsedge'}}
+
+
+def coverof(tree:BubbleTree, source, target) -> int:
+    """Return the number of edges covered by given (power) edge"""
+    return (tree.leaf_count(source) or 1) * (tree.leaf_count(target) or 1)
+
+
+# A level-of-detail view: the content of a container (None for the whole graph),
+#  shown down to some depth, deeper powernodes being collapsed.
+#  nodes -- pairs ((power)node, parent) of the visible (power)nodes
+#  collapsed -- visible powernodes whose content is not shown
+#  parent -- index of the view in which the container is collapsed
+LODView = namedtuple('LODView', 'container parent nodes collapsed')
+
+
+def lod_views(tree:BubbleTree, max_depth:int=None, node_budget:int=None) -> (list, dict):
+    """Return the level-of-detail views of given tree, and the mapping
+    (power)node -> index of the view in which it is visible.
+
+    The first view shows the roots and the content of powernodes,
+    down to max_depth levels of inclusion and while the number of shown
+    (power)nodes stays under node_budget (the roots are always shown).
+    Other powernodes are collapsed, and their content is shown by
+    another view, built the same way. Each (power)node is visible
+    in exactly one view.
+
+    """
+    views, view_of = [], {}
+    todo = deque([(None, None, sorted(tree.roots))])  # container, parent view, content
+    while todo:
+        container, parent_view, tops = todo.popleft()
+        idx = len(views)
+        nodes, collapsed = [(top, container) for top in tops], []
+        nb_nodes = len(nodes)
+        queue = deque((top, 0) for top in tops)
+        while queue:
+            node, depth = queue.popleft()
+            content = sorted(tree.inclusions.get(node, ()))
+            if not content:  # a node or an empty powernode
+                continue
+            if ((max_depth is not None and depth >= max_depth) or
+                    (node_budget is not None and nb_nodes + len(content) > node_budget)):
+                collapsed.append(node)
+                todo.append((node, idx, content))
+                continue
+            nb_nodes += len(content)
+            nodes.extend((sub, node) for sub in content)
+            queue.extend((sub, depth + 1) for sub in content)
+        for node, _ in nodes:
+            view_of[node] = idx
+        views.append(LODView(container, parent_view, nodes, frozenset(collapsed)))
+    return views, view_of
+
+
+def lod_elements(tree:BubbleTree, falsedges:iter=(), falsepoweredges:dict={},
+                 max_depth:int=None, node_budget:int=None,
+                 chunk_url:str='chunks/{}.json', width_as_cover:bool=True,
+                 show_cover:str='cover: {}', false_edge_on_hover:bool=True,
+                 default_poweredge_width:int=5) -> iter:
+    """Yield, for each view of given tree (see lod_views),
+    the list of its cytoscape elements, as cys_elements would.
+
+    Collapsed powernodes are summary nodes, with class summary,
+    the number of nodes they contain, and the url of the elements
+    of their view, obtained by formatting chunk_url with the view index.
+    Edges are linked to the visible (power)nodes containing their ends.
+    Edges sharing the same visible ends are aggregated in one edge,
+    covering the sum of their covers. The visible ends standing for
+    collapsed content are listed in the via data of the edge:
+    they must be removed when one of them is expanded.
+
+    The edges of a view are those having an end inside its container,
+    linked to the (power)nodes visible in this view or the views
+    containing it.
+
+    """
+    views, view_of = lod_views(tree, max_depth, node_budget)
+    clique_falsedges = find_clique_falsedges(tree, falsedges) if false_edge_on_hover else {}
+    use_cover = width_as_cover or show_cover
+    def view_path(idx:int) -> list:
+        "Return indexes of given view and views containing it"
+        path = []
+        while idx is not None:
+            path.append(idx)
+            idx = views[idx].parent
+        return path
+    def chain(node) -> list:
+        "Return given (power)node and its ancestors, nearest first"
+        return [node, *tree.ancestors(node)]
+
+    # aggregate edges, for each view: (source, target, type) -> [cover, nb edges, original edge, via]
+    aggregated = [{} for _ in views]
+    def add_edge(source, target, edgetype:str, cover:int):
+        chains = chain(source), chain(target)
+        for idx in set(view_path(view_of[source])) | set(view_path(view_of[target])):
+            path = set(view_path(idx))
+            ends = tuple(next(node for node in nodes if view_of[node] in path)
+                         for nodes in chains)
+            if ends[0] == ends[1]:  # inside a collapsed powernode
+                continue
+            via = {end for end in ends if end not in (source, target)}
+            if not tree.oriented:
+                ends = tuple(sorted(ends))
+            key = (*ends, edgetype)
+            if key in aggregated[idx]:
+                stats = aggregated[idx][key]
+                stats[0] += cover
+                stats[1] += 1
+                stats[3] |= via
+            else:
+                aggregated[idx][key] = [cover, 1, (source, target), via]
+    # symmetric edges dict is complete: keep one direction to avoid counting twice.
+    keep_all = tree.oriented or not tree.symmetric_edges
+    for source, targets in tree.edges.items():
+        for target in targets:
+            if target != source and (keep_all or source < target):  # cliques are not handled this way
+                add_edge(source, target, 'edge', coverof(tree, source, target))
+    if not false_edge_on_hover:
+        for source, target in itertools.chain(falsedges, *falsepoweredges.values()):
+            add_edge(source, target, 'falsedge', 1)
+
+    for idx, view in enumerate(views):
+        elements = []
+        for node, parent in view.nodes:
+            element = node_element(tree, node, parent, clique_falsedges)
+            if node in view.collapsed:
+                count = tree.leaf_count(node)
+                element['data'].update({'leaves': count, 'label': '{} ({})'.format(node, count),
+                                        'chunk': chunk_url.format(view_of[next(iter(tree.inclusions[node]))])})
+                element['classes'] = 'summary'
+            elements.append(element)
+        for (source, target, edgetype), (cover, nb_edges, edge, via) in aggregated[idx].items():
+            if edgetype == 'falsedge':
+                element = {'group': 'edges', 'data': {'source': source, 'target': target, 'type': 'falsedge'}}
+            else:
+                ispower = nb_edges > 1 or bool(via) or any(map(tree.is_powernode, (source, target)))
+                element = edge_element(source, target, ispower, cover if use_cover else None,
+                                       width_as_cover, show_cover, default_poweredge_width)
+            if via:
+                element['data']['via'] = sorted(via)
+            if nb_edges > 1:
+                element['data']['edges'] = nb_edges
+            elif edgetype == 'edge' and not via and ispower and frozenset(edge) in falsepoweredges:
+                element['data']['falsedges'] = sorted(map(list, falsepoweredges[frozenset(edge)]))
+            elements.append(element)
+        yield elements
+
+
+def layout_positions(tree:BubbleTree, layout:str='cose-bilkent') -> dict or None:
+    """Return the mapping (power)node -> (x, y) computed by given layout,
+    or None if the layout is computed by the browser."""
+    if layout not in LAYOUTS:
+        raise ValueError("Unknown layout '{}'. Available layouts: {}"
+                         "".format(layout, ', '.join(LAYOUTS)))
+    if layout == 'packing':
+        return circle_packing(tree)
+    return None
+
 
-    yield from JS_FOOTER
+def positioned(elements:iter, positions:dict=None) -> iter:
+    """Yield given cytoscape elements, nodes being given their position, if any"""
+    for element in elements:
+        if positions is not None and element['group'] == 'nodes':
+            x, y = positions[element['data']['id']]
+            element['position'] = {'x': round(x, 2), 'y': round(y, 2)}
+        yield element
 
+
+def js_callbacks(false_edge_on_hover:bool=True) -> list:
+    """Return the lines of js handling the hovering of elements"""
     if false_edge_on_hover:
-        yield from JS_MOUSEOVER_SHOW_CALLBACKS
-    else:
-        yield from JS_MOUSEOVER_WIDTH_CALLBACKS
+        return JS_MOUSEOVER_SHOW_CALLBACKS
+    return JS_MOUSEOVER_WIDTH_CALLBACKS
+
+
+def bbl_to_cys(bblfile:str, oriented:bool=False, cache:ParseCache=None,
+               layout:str='cose-bilkent', **style):
+    """Yield lines of js to write in output file.
+
+    cache -- a ParseCache used to get the parsed bubble file
+    layout -- one of LAYOUTS
+    style -- options for cys_elements
+
+    """
+    tree, falsedges, falsepoweredges = read_bubble(bblfile, oriented, cache)
+    positions = layout_positions(tree, layout)
+    yield from JS_HEADER
+    group = 'nodes'
+    elements = cys_elements(tree, falsedges, falsepoweredges, **style)
+    for element in positioned(elements, positions):
+        if element['group'] != group:  # nodes are done
+            group = element['group']
+            yield from JS_MIDDLE
+        yield ' '*8 + JS_ELEMENT_LINE(element)
+    if group == 'nodes':  # no edges at all
+        yield from JS_MIDDLE
+    yield from JS_ELEMENTS_END
+    yield from JS_LAYOUT if positions is None else JS_PRESET_LAYOUT
+    yield from js_callbacks(style.get('false_edge_on_hover', True))
+
+
+def fetching_js(elements_url:str, compressed:bool=False,
+                false_edge_on_hover:bool=True, expandable:bool=False,
+                preset:bool=False) -> iter:
+    """Yield lines of js building the graph from the elements
+    fetched at given url, as written by elements_to_file.
+
+    expandable -- summary nodes are expanded on tap, as written by lod_to_files
+    preset -- elements have positions, and are not laid out
+
+    """
+    yield from JS_FETCH_HEADER(elements_url, compressed)
+    yield from JS_CYTOSCAPE
+    yield from JS_FETCHED_ELEMENTS
+    yield from JS_PRESET_LAYOUT if preset else JS_LAYOUT
+    yield from js_callbacks(false_edge_on_hover)
+    if expandable:
+        yield from JS_EXPAND_CALLBACKS(preset)
+    yield from JS_FETCH_FOOTER
 
 
-def bubble_to_dir(bblfile:str, jsdir:str, oriented:bool=False, **style):
+def open_output(outfile:str, compress:bool=False) -> io.TextIOBase:
+    """Return a buffered text stream writing in given file, gzipped or not"""
+    if compress:
+        return io.TextIOWrapper(io.BufferedWriter(gzip.open(outfile, 'wb'), BUFFER_SIZE),
+                                encoding='utf-8')
+    return open(outfile, 'w', encoding='utf-8', buffering=BUFFER_SIZE)
+
+
+def elements_to_file(elements:iter, outfile:str, compress:bool=None):
+    """Write given cytoscape elements in given file, as a JSON array,
+    one element per line.
+
+    Elements are written as soon as they are computed,
+    so the document is never held in memory.
+    compress -- gzip the file. Default is to do it if outfile ends with .gz
+
+    """
+    if compress is None:
+        compress = outfile.endswith('.gz')
+    encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+    with open_output(outfile, compress) as fd:
+        fd.write('[')
+        for idx, element in enumerate(elements):
+            fd.write(',\n' if idx else '\n')
+            fd.write(encode(element))
+        fd.write('\n]\n')
+
+
+def lod_to_files(tree:BubbleTree, falsedges:iter, falsepoweredges:dict,
+                 jsonfile:str, compress:bool=None, max_depth:int=None,
+                 node_budget:int=None, positions:dict=None, **style) -> int:
+    """Write in given file the elements of the first level-of-detail
+    view of given tree (see lod_elements), and the elements of other
+    views in a directory next to it, named after the file.
+    Return the number of views.
+
+    compress -- gzip the files. Default is to do it if jsonfile ends with .gz
+    positions -- mapping (power)node -> (x, y), given to the nodes if not None
+    style -- options for cys_elements
+
+    """
+    if compress is None:
+        compress = jsonfile.endswith('.gz')
+    root = jsonfile[:-len('.gz')] if jsonfile.endswith('.gz') else jsonfile
+    chunkdir = os.path.splitext(root)[0] + '.chunks'
+    extension = '.json.gz' if compress else '.json'
+    chunk_url = os.path.basename(chunkdir) + '/{}' + extension
+    views = lod_elements(tree, falsedges, falsepoweredges, max_depth, node_budget,
+                         chunk_url=chunk_url, **style)
+    elements_to_file(positioned(next(views), positions), jsonfile, compress=compress)
+    if os.path.exists(chunkdir):
+        shutil.rmtree(chunkdir)
+    os.makedirs(chunkdir)
+    nb_views = 1
+    for elements in views:
+        elements_to_file(positioned(elements, positions),
+                         os.path.join(chunkdir, str(nb_views) + extension),
+                         compress=compress)
+        nb_views += 1
+    return nb_views
+
+
+def bubble_to_cyjson(bblfile:str, jsonfile:str, oriented:bool=False,
+                     cache:ParseCache=None, compress:bool=None,
+                     max_depth:int=None, node_budget:int=None,
+                     layout:str='cose-bilkent', **style):
+    """Write in jsonfile the cytoscape elements of the graph
+    depicted in bubble file.
+
+    compress -- gzip the file. Default is to do it if jsonfile ends with .gz
+    max_depth, node_budget -- if given, write level-of-detail views
+                              (see lod_to_files)
+    layout -- one of LAYOUTS. If precomputed, nodes are given their position.
+    style -- options for cys_elements
+
+    """
+    tree, falsedges, falsepoweredges = read_bubble(bblfile, oriented, cache)
+    positions = layout_positions(tree, layout)
+    if max_depth is not None or node_budget is not None:
+        lod_to_files(tree, falsedges, falsepoweredges, jsonfile, compress,
+                     max_depth, node_budget, positions, **style)
+        return
+    elements = cys_elements(tree, falsedges, falsepoweredges, **style)
+    elements_to_file(positioned(elements, positions), jsonfile, compress=compress)
+
+
+def bubble_to_dir(bblfile:str, jsdir:str, oriented:bool=False,
+                  cache:ParseCache=None, external_elements:bool=False,
+                  compress:bool=False, max_depth:int=None, node_budget:int=None,
+                  layout:str='cose-bilkent', **style):
     """
 
     bblfile -- filename containing bubble data
     jsdir -- a directory in which put the website, or the graph.js to fill,
              or the .html to fill with everything
     oriented -- True if the power graph oriented
-    style -- options for bbl_to_cys
+    cache -- a ParseCache used to get the parsed bubble file
+    external_elements -- when jsdir is a directory, write the elements
+                         in a JSON file fetched by the website,
+                         instead of inlining them in graph.js.
+                         The website must then be served over HTTP.
+    compress -- gzip the external elements file
+    max_depth, node_budget -- if given, write level-of-detail views
+                              (see lod_to_files), loaded when summary
+                              nodes are tapped. Implies external_elements.
+    layout -- one of LAYOUTS. If precomputed, the browser uses
+              the positions given to the nodes.
+    style -- options for cys_elements
 
     """
+    lod = max_depth is not None or node_budget is not None
+    external_elements = external_elements or lod
     extension = os.path.splitext(jsdir)[1]
     mode = 'w'
     if not extension:  # it's a directory: copy the directory template and fill it
@@ -130,13 +485,14 @@ def bubble_to_dir(bblfile:str, jsdir:str, oriented:bool=False, **style):
         father_dir = os.path.split(jsdir.rstrip('/'))[0]
         if father_dir:
             assert os.path.isdir(father_dir), '{} must be a directory'.format(father_dir)
-        template_dir = pkg_resources.resource_filename('bubbletools', '_js_dir_template')
-        shutil.copytree(template_dir, jsdir, copy_function=shutil.copy)
+        shutil.copytree(TEMPLATE_DIR, jsdir, copy_function=shutil.copy)
         code_js_file = os.path.join(jsdir, 'js/graph.js')
+    elif external_elements:
+        raise ValueError("External elements file needs a website directory,"
+                         " not '{}'".format(jsdir))
     elif extension == '.html':  # write everything in a single file
         code_js_file, mode = jsdir, 'a'
-        template_dir = pkg_resources.resource_filename('bubbletools', '_js_dir_template')
-        with open(code_js_file, 'w') as ofd, open(template_dir+'/index.html') as hfd:
+        with open(code_js_file, 'w') as ofd, open(os.path.join(TEMPLATE_DIR, 'index.html')) as hfd:
             basehtml = hfd.read()
             script_to_replace = '<script src="js/graph.js"></script>'
             start = basehtml.find(script_to_replace)
@@ -144,9 +500,23 @@ def bubble_to_dir(bblfile:str, jsdir:str, oriented:bool=False, **style):
             ofd.write(basehtml[:start].strip() + '\n<script>')
     else:  # it's a file: let's write directly the code in it
         code_js_file = jsdir
-    with open(code_js_file, mode) as fd:
-        for line in bbl_to_cys(bblfile, oriented=oriented, **style):
-            fd.write(line + '\n')
+    if external_elements:
+        elements_file = ELEMENTS_FILE + ('.gz' if compress else '')
+        tree, falsedges, falsepoweredges = read_bubble(bblfile, oriented, cache)
+        positions = layout_positions(tree, layout)
+        if lod:
+            lod_to_files(tree, falsedges, falsepoweredges, os.path.join(jsdir, elements_file),
+                         compress, max_depth, node_budget, positions, **style)
+        else:
+            elements = cys_elements(tree, falsedges, falsepoweredges, **style)
+            elements_to_file(positioned(elements, positions),
+                             os.path.join(jsdir, elements_file), compress=compress)
+        lines = fetching_js(elements_file, compress, style.get('false_edge_on_hover', True),
+                            expandable=lod, preset=positions is not None)
+    else:
+        lines = bbl_to_cys(bblfile, oriented=oriented, cache=cache, layout=layout, **style)
+    with open(code_js_file, mode, encoding='utf-8', buffering=BUFFER_SIZE) as fd:
+        fd.writelines(line + '\n' for line in lines)
     if extension == '.html':
         with open(code_js_file, 'a') as fd:
             fd.write('</script>' + basehtml[stop:])
@@ -3,70 +3,45 @@ to render a graph using cytoscape.js API
 
 """
 
-from itertools import count
-_next_uid = count(1)
-next_uid = lambda: next(_next_uid)
-
-def _attrs_to_json(attrs:dict):
-    return ', '.join(f"'{k}': " + (f"'{v}'" if isinstance(v, str) else str(v)) for k, v in attrs.items())
-
-
-def JS_NODE_LINE(id:str, parent:str=None, clique:bool=False, falsedges:iter=()) -> str:
-    attrs = {'id': id}
-    if parent:
-        attrs['parent'] = str(parent)
-    if clique:
-        attrs['type'] = 'clique'
-    falsedges = tuple(falsedges)
-    if falsedges:
-        attrs['falsedges'] = list(map(list, falsedges))
-    return ' '*8 + "{{ data: {{ {} }} }},".format(_attrs_to_json(attrs))
-
-def JS_EDGE_LINE(source:str, target:str, ispoweredge:bool, isreflexive:bool=False,
-                 id:str or int='', label:str='', attrs:dict={}) -> str:
-    """
+import json
 
-    >>> JS_EDGE_LINE('a', 'b', True)
-    "        { data: { source: 'a', target: 'b', type: 'poweredge' } },"
 
-    >>> JS_EDGE_LINE('a', 'b', False)
-    "        { data: { source: 'a', target: 'b' } },"
+def JS_ELEMENT_LINE(element:dict) -> str:
+    """Return the JSON object literal of given cytoscape element,
+    safe for inclusion in a html script.
 
-    >>> JS_EDGE_LINE('PWRN-a-1-1', 'PWRN-a-1-2', True)
-    "        { data: { source: 'PWRN-a-1-1', target: 'PWRN-a-1-2', type: 'poweredge' } },"
+    >>> print(JS_ELEMENT_LINE({'group': 'edges', 'data': {'source': 'a', 'target': "b'"}}))
+    {"group":"edges","data":{"source":"a","target":"b'"}},
 
-    """
-    classes = []
-    end = ''
-    if ispoweredge: end += ", type: '{}poweredge'".format('reflexive-' if isreflexive else '')
-    if label:
-        end += f", label: '{label}'"
-        classes.append('autorotate')
-    if classes:
-        end += " }, classes: '" + ' '.join(classes) + "' },"
-    else:
-        end += " } },"
-    id = str(id if id else next_uid())
-    if attrs:
-        attrs = ', ' + _attrs_to_json(attrs)
-    else:
-        attrs = ''
-    return ' '*8 + f"{{ data: {{ source: '{source}', target: '{target}'" + attrs + end
+    >>> print(JS_ELEMENT_LINE({'group': 'nodes', 'data': {'id': '</script>'}}))
+    {"group":"nodes","data":{"id":"<\\/script>"}},
 
-def JS_FALSEDGE_LINE(source:str, target:str, id:str or int='') -> str:
     """
+    return json.dumps(element, separators=(',', ':')).replace('</', '<\\/') + ','
+
 
-    >>> JS_FALSEDGE_LINE('a', 'b')
-    "        { data: { source: 'a', target: 'b', type: 'falsedge' } },"
+def JS_FETCH_HEADER(url:str, compressed:bool=False) -> list:
+    """Return the lines of js fetching the elements at given url,
+    and giving them to the cytoscape instance built by the following lines.
+    Elements may be gzipped, in which case they are decompressed
+    by the browser.
 
     """
-    return ' '*8 + f"{{ data: {{ source: '{source}', target: '{target}', type: 'falsedge' }} }},"
+    if compressed:
+        parse = "new Response(response.body.pipeThrough(new DecompressionStream('gzip'))).json()"
+    else:
+        parse = 'response.json()'
+    return [
+        'var load_elements = function(url) {',
+        '  return fetch(url).then(function(response) {{ return {}; }});'.format(parse),
+        '};',
+        'load_elements({}).then(function(elements) {{'.format(json.dumps(url)),
+    ]
 
+JS_FETCH_FOOTER = ['});']
 
-JS_FOOTER = """
-    ]
-  },
 
+JS_LAYOUT = """
   layout: {
     name: 'cose-bilkent',
     numIter: 4000,
@@ -150,13 +125,43 @@ cy.on('mouseout', 'node[falsedges]', callback_remove_false_edges);
 """.strip().splitlines(False)
 
 
+def JS_EXPAND_CALLBACKS(preset:bool=False) -> list:
+    """Return the lines of js expanding the summary nodes on tap:
+    their content replaces the edges standing for it.
+    If preset, the content comes with its positions and is not laid out.
+
+    """
+    return JS_EXPAND_START + ([] if preset else JS_EXPAND_LAYOUT) + JS_EXPAND_END
+
+JS_EXPAND_START = """
+// Expansion of summary nodes: their content replaces the edges standing for it
+cy.on('tap', 'node.summary', function(evt) {
+    var node = evt.target;
+    node.removeClass('summary');
+    load_elements(node.data('chunk')).then(function(elements) {
+        cy.edges().filter(function(edge) {
+            return (edge.data('via') || []).indexOf(node.id()) >= 0;
+        }).remove();
+        var added = cy.add(elements);
+""".strip('\n').splitlines(False)
+
+JS_EXPAND_LAYOUT = """
+        added.layout({
+            name: 'cose-bilkent', randomize: false, fit: false, animate: false,
+            nodeDimensionsIncludeLabels: true,
+        }).run();
+""".strip('\n').splitlines(False)
+
+JS_EXPAND_END = ['    });', '});', '']
+
+
 JS_MIDDLE = """
     ],
     edges: [
 """.strip().splitlines(False)
 
 
-JS_HEADER = """
+JS_CYTOSCAPE = """
 var cy = window.cy = cytoscape({
   container: document.getElementById('cy'),
 
@@ -287,6 +292,15 @@ var cy = window.cy = cytoscape({
             'border-color': 'green',
         }
     },
+    {
+        selector: '.summary',
+        css: {
+            'content': 'data(label)',
+            'border-width': 3,
+            'border-style': 'dashed',
+            'border-color': 'black',
+        }
+    },
     {
         selector: '.top-center',
         css: {
@@ -295,7 +309,17 @@ var cy = window.cy = cytoscape({
         }
     },
   ],
+""".strip().splitlines(False)
 
-  elements: {
-    nodes: [
+JS_HEADER = JS_CYTOSCAPE + ['', '  elements: {', '    nodes: [']
+JS_PRESET_LAYOUT = """
+  layout: {
+    name: 'preset',  // positions are given by the elements
+    fit: true,
+    padding: 20,
+  }
+});
 """.strip().splitlines(False)
+
+JS_ELEMENTS_END = ['    ]', '  },', '']
+JS_FETCHED_ELEMENTS = ['', '  elements: elements,', '']
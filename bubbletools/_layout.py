@@ -0,0 +1,83 @@
+"""Layout of a powergraph tree, computed once instead of by each viewer.
+
+Nodes are circles, and each powernode is a circle packing
+its content. Circles are packed by rings around the biggest one,
+from the deepest powernodes up to the roots, then positions
+are made absolute from the roots down.
+
+"""
+
+
+import math
+
+
+def circle_packing(tree:'BubbleTree', node_radius:float=20., padding:float=30.) -> dict:
+    """Return the mapping (power)node -> (x, y) of the center of its circle.
+
+    node_radius -- radius of the circle of a node (or empty powernode)
+    padding -- distance between a powernode circle and its content
+
+    Powernodes contained by many powernodes are placed in only one of them.
+
+    """
+    radius, offsets = {}, {}  # (power)node -> radius, (power)node -> content -> (dx, dy)
+    for name in tree.postorder():  # content is packed before its container
+        content = sorted(tree.inclusions[name])
+        if content:
+            relative, enclosing = pack(tuple(radius[sub] for sub in content))
+            offsets[name] = dict(zip(content, relative))
+            radius[name] = enclosing + padding
+        else:
+            radius[name] = node_radius
+    roots = sorted(tree.roots)
+    relative, _ = pack(tuple(radius[root] for root in roots))
+    positions = dict(zip(roots, relative))
+    for name in tree.preorder():  # containers are placed before their content
+        x, y = positions[name]
+        for sub, (dx, dy) in offsets.get(name, {}).items():
+            positions.setdefault(sub, (x + dx, y + dy))
+    return positions
+
+
+def pack(radii:tuple) -> (list, float):
+    """Return the positions of the centers of the circles of given radii,
+    packed around the origin without overlap, and the radius of the circle
+    centered on origin enclosing them all.
+
+    >>> pack((1.,))
+    ([(0.0, 0.0)], 1.0)
+    >>> positions, enclosing = pack((2., 1., 1.))
+    >>> positions[0], round(enclosing, 6)
+    ((0.0, 0.0), 4.0)
+
+    """
+    if not radii:
+        return [], 0.
+    order = sorted(range(len(radii)), key=lambda idx: -radii[idx])
+    positions = [None] * len(radii)
+    first = order[0]
+    positions[first] = (0., 0.)
+    enclosing = inner = radii[first]  # inner: radius of the disk filled by previous rings
+    ring, angle, ring_radius, ring_first = None, 0., 0., None
+    for idx in order[1:]:
+        radius = radii[idx]
+        if ring is not None:  # try to place it next to the previous circle of the ring
+            step = _angle(ring_radius, radii[ring], radius)
+            closing = _angle(ring_radius, radius, radii[ring_first])
+            if angle + step + closing <= 2 * math.pi:
+                angle += step
+            else:  # ring is full: start a new one
+                inner = ring_radius + radii[ring_first]
+                ring = None
+        if ring is None:  # circles are sorted: first one of the ring is the biggest
+            ring_radius, angle, ring_first = inner + radius, 0., idx
+        ring = idx
+        positions[idx] = (ring_radius * math.cos(angle), ring_radius * math.sin(angle))
+        enclosing = max(enclosing, ring_radius + radius)
+    return positions, enclosing
+
+
+def _angle(ring_radius:float, radius_a:float, radius_b:float) -> float:
+    """Return the angle between the centers of two tangent circles
+    of given radii, centered on a ring of given radius"""
+    return 2 * math.asin(min(1., (radius_a + radius_b) / (2 * ring_radius)))
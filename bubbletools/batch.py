@@ -0,0 +1,110 @@
+"""Routines for processing many bubble files at once, in parallel.
+
+Each bubble file is handled by a worker of a process pool,
+so the interpreter startup and the imports are paid once per worker,
+not once per file.
+
+"""
+
+
+import os
+import glob
+import time
+import itertools as it
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from bubbletools import validator
+from bubbletools import converter
+
+
+# Outcome of the processing of one bubble file
+BatchResult = namedtuple('BatchResult', 'bblfile outfile duration error logs')
+
+# command -> extension of output files ('' for directories)
+OUTPUT_EXTENSIONS = {'validate': None, 'dot': '.dot', 'gexf': '.gexf', 'js': ''}
+
+
+def expand_inputs(inputs:iter) -> tuple:
+    """Return the bubble files designated by given inputs, that can be
+    file names, glob patterns or directories (in which case all
+    .bbl files they contain are used)."""
+    def expand(path:str) -> iter:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, '*.bbl')))
+        else:  # an unmatched pattern is kept, in order to report the error
+            yield from sorted(glob.glob(path)) or (path,)
+    return tuple(dict.fromkeys(it.chain.from_iterable(map(expand, inputs))))
+
+
+def output_file(bblfile:str, command:str, outdir:str=None) -> str or None:
+    """Return the file or directory in which given command
+    will write the conversion of given bubble file."""
+    extension = OUTPUT_EXTENSIONS[command]
+    if extension is None:
+        return None
+    base = os.path.splitext(bblfile)[0]
+    if outdir:
+        base = os.path.join(outdir, os.path.basename(base))
+    return base + extension
+
+
+def process_file(command:str, bblfile:str, outfile:str=None,
+                 oriented:bool=False, profiling:bool=False) -> BatchResult:
+    """Run given command on given bubble file, and return the BatchResult.
+
+    Errors are catched and reported in the BatchResult,
+    so that a bad file does not stop the batch.
+
+    """
+    start, error, logs = time.perf_counter(), None, ()
+    try:
+        if command == 'validate':
+            logs = tuple(validator.validate(bblfile, profiling=profiling))
+        elif command == 'dot':
+            converter.bubble_to_dot(bblfile, outfile, oriented=oriented)
+        elif command == 'gexf':
+            converter.bubble_to_gexf(bblfile, outfile, oriented=oriented)
+        elif command == 'js':
+            converter.bubble_to_js(bblfile, outfile, oriented=oriented)
+        else:
+            raise ValueError("Unknown batch command '{}'".format(command))
+    except Exception as err:
+        error = '{}: {}'.format(type(err).__name__, err)
+    return BatchResult(bblfile, outfile, time.perf_counter() - start, error, logs)
+
+
+def run_batch(command:str, inputs:iter, outdir:str=None, workers:int=None,
+              oriented:bool=False, profiling:bool=False) -> iter:
+    """Yield a BatchResult for each bubble file designated by given inputs,
+    in the same order, after running on it given command.
+
+    command -- one of validate, dot, gexf or js
+    inputs -- file names, glob patterns or directories (see expand_inputs)
+    outdir -- directory of output files. Default is next to the bubble files.
+              Bubble files with the same name in different directories
+              can't be converted in the same outdir: ValueError is raised
+              before processing any file.
+    workers -- number of processes. Default is the number of CPUs.
+               With 1 worker, files are processed in the current process.
+
+    """
+    if command not in OUTPUT_EXTENSIONS:
+        raise ValueError("Unknown batch command '{}'".format(command))
+    bblfiles = expand_inputs(inputs)
+    outfiles = tuple(output_file(bblfile, command, outdir) for bblfile in bblfiles)
+    written = {}  # output file -> bubble file converted in it
+    for bblfile, outfile in zip(bblfiles, outfiles):
+        if outfile is not None and written.setdefault(os.path.abspath(outfile), bblfile) != bblfile:
+            raise ValueError("Files '{}' and '{}' would both be converted in '{}'".format(
+                written[os.path.abspath(outfile)], bblfile, outfile))
+    if outdir:
+        os.makedirs(outdir, exist_ok=True)
+    args = ((command,) * len(bblfiles), bblfiles, outfiles,
+            (oriented,) * len(bblfiles), (profiling,) * len(bblfiles))
+    if workers == 1:
+        yield from map(process_file, *args)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            chunksize = max(1, len(bblfiles) // (4 * (workers or os.cpu_count() or 1)))
+            yield from pool.map(process_file, *args, chunksize=chunksize)
@@ -3,11 +3,11 @@
 """
 
 
-import functools
 import itertools as it
-from collections import defaultdict, namedtuple
+from collections import defaultdict, namedtuple, deque
 
 from bubbletools import utils
+from bubbletools._compact import GraphView, SuccessorsView, compact_graphs, graphs_from_records
 
 
 # Powernode data aggregation
@@ -21,31 +21,263 @@ class BubbleTree:
 
     def __init__(self, edges:dict, inclusions:dict, roots:frozenset,
                  oriented:bool=False, symmetric_edges:bool=False):
-        self._edges, self._inclusions = dict(edges), dict(inclusions)
-        self._roots = frozenset(roots)
+        # compact graphs are read-only, and can be shared as is
+        self._edges = edges if isinstance(edges, GraphView) else dict(edges)
+        self._inclusions = inclusions if isinstance(inclusions, GraphView) else dict(inclusions)
+        self._roots = roots if isinstance(roots, SuccessorsView) else frozenset(roots)
         self._oriented = bool(oriented)
-        self._edge_reduction = None  # computed on time
         self.symmetric_edges = bool(symmetric_edges)
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """Drop all data computed from edges and inclusions.
+
+        Must be called after any modification of edges or inclusions.
+
+        """
+        self._edge_reduction = None  # computed on time
+        self._parents = None  # computed on time
+        self._intervals = None  # computed on time
+        self._leaf_counts = None  # computed on time
+        self._leaves = {}  # powernode -> frozenset of nodes, populated on demand
+        self._connected_components = None  # computed on time
+        self._links = None  # computed on time
+
+    def compute_edge_reduction(self, approximate:bool=False) -> float:
+        """Compute the edge reduction. Costly computation.
+
+        approximate -- estimate the number of initial edges
+                       (see init_edge_number)
 
-    def compute_edge_reduction(self) -> float:
-        """Compute the edge reduction. Costly computation"""
-        nb_init_edge = self.init_edge_number()
+        """
+        nb_init_edge = self.init_edge_number(approximate=approximate)
         nb_poweredge = self.edge_number()
         return (nb_init_edge - nb_poweredge) / (nb_init_edge)
 
-    def init_edge_number(self) -> int:
-        """Return the number of edges present in the non-compressed graph"""
-        return len(frozenset(frozenset(edge) for edge in self.initial_edges()))
+    def init_edge_number(self, approximate:bool=False, precision:int=12) -> int:
+        """Return the number of edges present in the non-compressed graph.
+
+        Edges are counted from the number of neighbors of each node
+        (see neighbor_counts), without being enumerated.
+        Orientation is ignored, and self-loops are counted once.
+
+        approximate -- estimate the number of neighbors of each node
+                       with cardinality sketches of given precision
+                       (see utils.HyperLogLog)
+
+        """
+        total, loops = 0, 0
+        for _, count, self_linked in self.neighbor_counts(approximate, precision):
+            total += count
+            loops += self_linked
+        return round((total + loops) / 2) if approximate else (total + loops) // 2
+
+    def neighbor_counts(self, approximate:bool=False, precision:int=12) -> iter:
+        """Yield (node, number of neighbors, self-linked) for each node
+        of the non-compressed graph, without enumerating its edges.
+
+        The neighbors of a node are the nodes in the (power)nodes
+        linked to it or to one of its ancestors, orientation ignored.
+        When inclusions are a tree, the inclusion tree is walked
+        top-down, keeping for each powernode the maximal (power)nodes
+        linked to it or to its ancestors, whose leaf counts are summed.
+        Otherwise, the leaf sets of the linked (power)nodes
+        are merged for each node.
+
+        approximate -- the number of neighbors is estimated,
+                       with cardinality sketches of given precision
+                       merged top-down (see utils.HyperLogLog), so that
+                       memory does not depend on the size of neighborhoods
+
+        """
+        yield from self._neighbor_counts(self.links, approximate, precision)
+
+    def _neighbor_counts(self, graph:dict, approximate:bool=False, precision:int=12) -> iter:
+        """Implementation of neighbor_counts, the neighbors of a node
+        being the nodes in the (power)nodes linked to it or to one of its
+        ancestors in given graph.
+
+        Self-linked flags are exact only if given graph is symmetric.
+
+        """
+        if approximate and not utils.have_cycle(self.inclusions):
+            yield from self._sketched_neighbor_counts(graph, precision)
+        elif self.intervals is None:  # overlapping powernodes or inclusion cycles
+            counts = {}  # frozenset of linked (power)nodes -> number of nodes in them
+            for node, chain, linked in self._overlapping_links(graph):
+                if linked not in counts:
+                    counts[linked] = len(set().union(*(
+                        self.leaves(other) if self.is_powernode(other) else (other,)
+                        for other in linked)))
+                yield node, counts[linked], not linked.isdisjoint(chain)
+        else:
+            for node, _, count, self_linked in self._laminar_links(graph):
+                yield node, count, self_linked
+
+    def _node_count(self, name) -> int:
+        """Return the number of nodes in given (power)node, itself included"""
+        return self.leaf_count(name) if self.is_powernode(name) else 1
+
+    def _self_linked(self, name, linked:iter) -> bool:
+        """True if given (power)node is linked to itself or to one of its ancestors"""
+        return any(other == name or self.is_in(name, other) for other in linked)
+
+    def _overlapping_links(self, graph:dict) -> iter:
+        """Yield (node, node and its ancestors, (power)nodes linked to them)
+        for each node, as frozensets"""
+        for node in self.nodes():
+            chain = frozenset(it.chain((node,), self.ancestors(node)))
+            yield node, chain, frozenset(it.chain.from_iterable(graph.get(name, ()) for name in chain))
+
+    def _laminar_links(self, graph:dict) -> iter:
+        """Yield (node, maximal linked (power)nodes, their leaf count, self-linked)
+        for each node, when inclusions are a tree.
+
+        Maximal linked (power)nodes are the ones linked to the node or
+        to one of its ancestors, and not contained by another of them,
+        given as (enter, exit, (power)node) sorted by enter time.
+        Nodes are yielded in the order of depth_first.
+
+        """
+        intervals = self.intervals
+        stack = [(root, (), 0, False) for root in reversed(tuple(self.roots))]
+        while stack:
+            name, maximals, count, self_linked = stack.pop()
+            linked = graph.get(name)
+            if linked:  # else, neighbors are the ones of the parent
+                self_linked = self_linked or self._self_linked(name, linked)
+                maximals = utils.maximal_intervals(
+                    maximals, sorted(intervals[other] + (other,) for other in linked))
+                count = sum(map(self._node_count, (other for *_, other in maximals)))
+            if self.is_node(name):
+                yield name, maximals, count, self_linked
+            else:
+                stack.extend((sub, maximals, count, self_linked) for sub in self.inclusions[name])
+
+    def _sketched_neighbor_counts(self, graph:dict, precision:int) -> iter:
+        """Implementation of neighbor_counts for the approximate mode,
+        for inclusions without cycles.
+
+        Sketches are kept only while needed: the sketch of the nodes
+        in a powernode is dropped once merged in all its containers,
+        unless the powernode is linked, and the sketch of the neighbors
+        of a powernode is dropped once given to all its content.
+
+        """
+        order = tuple(self.postorder())  # content before containers
+        linked_powernodes = {other for linked in graph.values() for other in linked
+                             if self.is_powernode(other)}
+        leaf_sketches = {}  # powernode -> sketch of its nodes
+        waiting_containers = {}  # powernode -> number of containers not yet sketched
+        for name in order:
+            if self.is_powernode(name):
+                sketch = utils.HyperLogLog(precision)
+                for sub in self.inclusions[name]:
+                    if self.is_node(sub):
+                        sketch.add(sub)
+                        continue
+                    sketch = sketch.merged(leaf_sketches[sub])
+                    waiting = waiting_containers.pop(sub, len(self.parents[sub])) - 1
+                    if waiting:
+                        waiting_containers[sub] = waiting
+                    elif sub not in linked_powernodes:
+                        del leaf_sketches[sub]
+                leaf_sketches[name] = sketch
+        for name in tuple(leaf_sketches):  # roots not linked to anything
+            if name not in linked_powernodes:
+                del leaf_sketches[name]
+        reached, self_linked = {}, {}  # powernode -> sketch of neighbors or None, self-linked
+        waiting_content = {}  # powernode -> number of (power)nodes in it not yet walked
+        for name in reversed(order):  # containers before content
+            sketch, linked_self = None, False
+            for parent in self.parents.get(name, ()):
+                linked_self = linked_self or self_linked[parent]
+                if reached[parent] is not None:
+                    sketch = reached[parent] if sketch is None else sketch.merged(reached[parent])
+                waiting = waiting_content.pop(parent, len(self.inclusions[parent])) - 1
+                if waiting:
+                    waiting_content[parent] = waiting
+                else:
+                    del reached[parent], self_linked[parent]
+            linked = graph.get(name, ())
+            if linked:
+                linked_self = linked_self or self._self_linked(name, linked)
+                sketch = utils.HyperLogLog(precision) if sketch is None else sketch.copy()
+                for other in linked:
+                    if self.is_node(other):
+                        sketch.add(other)
+                    else:
+                        sketch = sketch.merged(leaf_sketches[other])
+            if self.is_node(name):
+                yield name, sketch.cardinality() if sketch else 0, linked_self
+            elif self.inclusions[name]:
+                reached[name], self_linked[name] = sketch, linked_self
 
     def initial_edges(self) -> iter:
         """Yield edges in the initial (uncompressed) graphs. Possible doublons."""
-        nodes_in = lambda n: ([n] if self.is_node(n) else self.nodes_in(n))
+        nodes_in = lambda n: ((n,) if self.is_node(n) else self.leaves(n))
         for node, succs in self.edges.items():
             twos = tuple(two for succ in succs for two in nodes_in(succ))
             for one in nodes_in(node):
                 for two in twos:
                     yield one, two
 
+    def has_edge(self, source, target) -> bool:
+        """True if given nodes are linked in the non-compressed graph,
+        from source to target if the graph is oriented.
+
+        A poweredge is searched between the nodes or their ancestors,
+        without decompression.
+
+        """
+        self.assert_node(source)
+        self.assert_node(target)
+        targets = frozenset(it.chain((target,), self.ancestors(target)))
+        graph = self.edges if self.oriented else self.links
+        return any(not graph.get(name, frozenset()).isdisjoint(targets)
+                   for name in it.chain((source,), self.ancestors(source)))
+
+    def neighbors(self, node) -> frozenset:
+        """Return the nodes linked to given node in the non-compressed graph
+        (its successors if the graph is oriented), itself included
+        if it is linked to itself."""
+        return frozenset().union(*(
+            self.leaves(other) if self.is_powernode(other) else (other,)
+            for other in self._linked_to(node)))
+
+    def degree(self, node) -> int:
+        """Return the number of neighbors of given node (see neighbors).
+
+        When inclusions are a tree, the node counts of the maximal
+        linked (power)nodes are summed, without building the neighbor set.
+
+        """
+        if self.intervals is None:
+            return len(self.neighbors(node))
+        intervals = self.intervals
+        maximals = utils.maximal_intervals(sorted(intervals[other] + (other,)
+                                                  for other in self._linked_to(node)))
+        return sum(map(self._node_count, (other for *_, other in maximals)))
+
+    def degrees(self, approximate:bool=False, precision:int=12) -> dict:
+        """Return the mapping node -> degree (see degree) for all nodes,
+        computed in one top-down walk of the inclusions (see neighbor_counts).
+
+        approximate -- estimate the degrees with cardinality sketches
+                       of given precision, returned degrees being floats
+
+        """
+        graph = self.edges if self.oriented else self.links
+        return {node: count for node, count, _ in self._neighbor_counts(graph, approximate, precision)}
+
+    def _linked_to(self, node) -> frozenset:
+        """Return the (power)nodes linked to given node or to its ancestors,
+        as successors if the graph is oriented"""
+        self.assert_node(node)
+        graph = self.edges if self.oriented else self.links
+        return frozenset(it.chain.from_iterable(
+            graph.get(name, ()) for name in it.chain((node,), self.ancestors(node))))
+
     @property
     def oriented(self) -> bool:
         return self._oriented
@@ -62,6 +294,61 @@ class BubbleTree:
     def roots(self) -> frozenset:
         return self._roots
 
+    @property
+    def links(self) -> dict:
+        """Mapping (power)node -> (power)nodes linked to it by an edge,
+        in any direction. Same as edges when they are symmetric."""
+        if self._links is None:
+            self._links = self.edges if self.symmetric_edges else utils.completed_graph(self.edges)
+        return self._links
+
+    @property
+    def is_compact(self) -> bool:
+        """True if edges and inclusions are stored as integer arrays"""
+        return isinstance(self._inclusions, GraphView)
+
+    def compacted(self) -> 'BubbleTree':
+        """Return an equivalent BubbleTree, with (power)node names interned
+        as integers, and edges and inclusions stored in integer arrays.
+
+        Returned tree is read-only: its edges and inclusions are
+        mappings of sets that cannot be modified.
+
+        """
+        if self.is_compact:
+            return self
+        edges, inclusions = compact_graphs(self.edges, self.inclusions)
+        return BubbleTree(edges=edges, inclusions=inclusions, roots=self.roots,
+                          oriented=self.oriented,
+                          symmetric_edges=self.symmetric_edges)
+
+    @property
+    def parents(self) -> dict:
+        """Mapping (power)node -> set of (power)nodes directly containing it.
+        Roots are not keys."""
+        if self._parents is None:
+            if self.is_compact:
+                self._parents = self._inclusions.reversed()
+            else:
+                self._parents = utils.reversed_graph(self._inclusions)
+        return self._parents
+
+    @property
+    def intervals(self) -> dict or None:
+        """Mapping (power)node -> (enter, exit) times of a depth-first walk
+        of the inclusion tree, or None if the inclusions do not describe
+        a tree (overlapping powernodes or inclusion cycles)."""
+        if self._intervals is None:
+            self._intervals = self.compute_intervals() or False
+        return self._intervals or None
+
+    @property
+    def leaf_counts(self) -> dict:
+        """Mapping (power)node -> number of nodes it contains, at any level"""
+        if self._leaf_counts is None:
+            self._leaf_counts = self.compute_leaf_counts()
+        return self._leaf_counts
+
     @property
     def edge_reduction(self) -> int:
         if self._edge_reduction is None:
@@ -72,28 +359,34 @@ class BubbleTree:
     def connected_components(self) -> (dict, dict):
         """Return for one root of each connected component all
         the linked objects, and the mapping linking a connected component
-        root with the roots that it contains."""
-        inclusions = utils.completed_graph(self.inclusions)  # allow bottom-up movement
-        edges = utils.completed_graph(self.edges) if self.oriented else self.edges
-        cc = {}  # maps cc root with nodes in the cc
-        subroots = defaultdict(set)  # maps cc root with other roots of the cc
-        walked_roots = set()  # all roots that have been walked already
-        for root in self.roots:
-            if root in walked_roots: continue  # this cc have been done already
-            # walk in the graph starting at root
-            cc[root] = set([root])
-            walked = cc[root]
-            stack = list(edges.get(root, ())) + list(inclusions.get(root, ()))
-            while len(stack) > 0:
-                *stack, curr = stack
-                walked.add(curr)
-                if curr in self.roots:  # don't do the walk for already found roots
-                    walked_roots.add(curr)
-                    subroots[root].add(curr)
-                for succ in it.chain(edges.get(curr, ()), inclusions.get(curr, ())):
-                    if succ not in walked:
-                        stack.append(succ)
-        return cc, dict(subroots)
+        root with the roots that it contains.
+
+        Components are computed once, with a union-find over
+        edges and inclusions, and kept until invalidate_cache is called.
+        Objects of components containing no root are ignored.
+
+        """
+        if self._connected_components is None:
+            representatives = utils.component_representatives((self.edges, self.inclusions))
+            cc_roots = {}  # representative -> root of the cc
+            subroots = defaultdict(set)  # maps cc root with other roots of the cc
+            for root in self.roots:
+                representative = representatives.get(root, root)
+                if representative in cc_roots:
+                    subroots[cc_roots[representative]].add(root)
+                else:
+                    cc_roots[representative] = root
+            cc = defaultdict(set)  # maps cc root with nodes in the cc
+            for node, representative in representatives.items():
+                if representative in cc_roots:
+                    cc[cc_roots[representative]].add(node)
+            for root in cc_roots.values():  # roots linked to nothing
+                cc[root].add(root)
+            self._connected_components = (
+                {root: frozenset(cc[root]) for root in cc_roots.values()},
+                {root: frozenset(roots) for root, roots in subroots.items()},
+            )
+        return self._connected_components
 
 
     def assert_powernode(self, name:str) -> None or ValueError:
@@ -107,10 +400,21 @@ class BubbleTree:
             raise ValueError("Given name '{}' is a node.".format(name))
 
 
+    def assert_node(self, name:str) -> None or ValueError:
+        """Do nothing if given name refers to a node in given graph.
+        Raise a ValueError in any other case.
+
+        """
+        if name not in self.inclusions:
+            raise ValueError("Node '{}' does not exists.".format(name))
+        if self.is_powernode(name):
+            raise ValueError("Given name '{}' is a powernode.".format(name))
+
+
     def powernode_data(self, name:str) -> Powernode:
         """Return a Powernode object describing the given powernode"""
         self.assert_powernode(name)
-        contained_nodes = frozenset(self.nodes_in(name))
+        contained_nodes = self.leaves(name)
         return Powernode(
             size=len(contained_nodes),
             contained=frozenset(self.all_in(name)),
@@ -150,7 +454,52 @@ class BubbleTree:
 
     def nodes_in(self, name) -> iter:
         """Yield all nodes contained in given (power) node"""
-        yield from (node for node in self.all_in(name) if self.is_node(node))
+        yield from self.leaves(name)
+
+    def leaves(self, name) -> frozenset:
+        """Return the frozenset of nodes contained in given (power) node.
+
+        Sets are computed once per powernode, and kept
+        until the next call to invalidate_cache.
+
+        """
+        if name not in self._leaves:
+            if self.is_node(name):
+                return frozenset()
+            walked, leaves = set(), set()
+            stack = list(self.inclusions[name])
+            while stack:
+                curr = stack.pop()
+                if curr in walked: continue
+                walked.add(curr)
+                if curr in self._leaves:  # reuse already computed sets
+                    leaves |= self._leaves[curr]
+                elif self.is_node(curr):
+                    leaves.add(curr)
+                else:
+                    stack.extend(self.inclusions[curr])
+            self._leaves[name] = frozenset(leaves)
+        return self._leaves[name]
+
+    def leaf_count(self, name) -> int:
+        """Return the number of nodes contained in given (power) node"""
+        return self.leaf_counts[name]
+
+    def compute_leaf_counts(self) -> dict:
+        """Return the mapping (power)node -> number of contained nodes.
+
+        When inclusions are a tree, counts are summed bottom-up
+        in one post-order walk. Otherwise, nodes contained
+        by many powernodes must be counted once, and leaf sets are used.
+
+        """
+        if self.intervals is None:
+            return {name: len(self.leaves(name)) for name in self.inclusions}
+        counts = {}
+        for name in self.postorder():  # subs are counted before their container
+            counts[name] = sum(counts[sub] if self.is_powernode(sub) else 1
+                               for sub in self.inclusions[name])
+        return counts
 
     def powernodes_in(self, name) -> iter:
         """Yield all power nodes contained in given (power) node"""
@@ -158,9 +507,54 @@ class BubbleTree:
 
     def all_in(self, name) -> iter:
         """Yield all (power) nodes contained in given (power) node"""
-        for elem in self.inclusions[name]:
-            yield elem
-            yield from self.all_in(elem)
+        yield from it.islice(self.preorder(name), 1, None)
+
+
+    def depth_first(self, *names) -> iter:
+        """Yield pairs ((power)node, entering) describing a depth-first walk
+        of the inclusions, starting at given (power)nodes (default: the roots).
+
+        Each (power)node is yielded with entering=True before its content,
+        then with entering=False after it. Each (power)node is walked once,
+        even if it is contained by many powernodes. The walk uses an explicit
+        stack, so the depth of the inclusions is not bounded by the
+        recursion limit.
+
+        """
+        walked = set()
+        stack = [(name, True) for name in reversed(names or tuple(self.roots))]
+        while stack:
+            name, entering = stack.pop()
+            if not entering:
+                yield name, False
+            elif name not in walked:
+                walked.add(name)
+                yield name, True
+                stack.append((name, False))
+                stack.extend((sub, True) for sub in self.inclusions[name])
+
+    def preorder(self, *names) -> iter:
+        """Yield given (power)nodes (default: the roots) and all (power)nodes
+        they contain, containers before their content."""
+        yield from (name for name, entering in self.depth_first(*names) if entering)
+
+    def postorder(self, *names) -> iter:
+        """Yield given (power)nodes (default: the roots) and all (power)nodes
+        they contain, containers after their content."""
+        yield from (name for name, entering in self.depth_first(*names) if not entering)
+
+    def levelorder(self, *names) -> iter:
+        """Yield given (power)nodes (default: the roots) and all (power)nodes
+        they contain, by increasing depth."""
+        names = names or tuple(self.roots)
+        walked, queue = set(names), deque(names)
+        while queue:
+            name = queue.popleft()
+            yield name
+            for sub in self.inclusions[name]:
+                if sub not in walked:
+                    walked.add(sub)
+                    queue.append(sub)
 
 
     def powernodes_containing(self, name, directly=False) -> iter:
@@ -170,24 +564,56 @@ class BubbleTree:
 
         """
         if directly:
-            yield from (node for node in self.all_in(name)
-                        if name in self.inclusions[node])
+            yield from self.parents.get(name, ())
         else:
-            # This algorithm is very bad. Inverting the inclusion dict could
-            #  be far better.
-            @functools.lru_cache(maxsize=self.node_number(count_pnode=True))
-            def contains_target(node, target):
-                succs = self.inclusions[node]
-                if target in succs:
-                    return True
-                else:
-                    return any(contains_target(succ, target) for succ in succs)
-            # populate the cache
-            for root in self.roots:
-                contains_target(root, name)
-            # output all that contains target at some level
-            yield from (node for node in self.inclusions.keys()
-                        if contains_target(node, name))
+            yield from self.ancestors(name)
+
+    def ancestors(self, name) -> iter:
+        """Yield all powernodes containing given (power)node,
+        walking up from its direct parents.
+
+        Walk up the parent index, so it takes time proportional
+        to the depth of given (power)node.
+
+        """
+        walked = set()
+        stack = list(self.parents.get(name, ()))
+        while stack:
+            curr = stack.pop()
+            if curr not in walked:
+                walked.add(curr)
+                yield curr
+                stack.extend(self.parents.get(curr, ()))
+
+    def is_in(self, name, container) -> bool:
+        """True if given (power)node is contained by given container,
+        directly or not.
+
+        Constant time comparison of intervals when the inclusions
+        are a tree, walk up the parent index otherwise.
+
+        """
+        intervals = self.intervals
+        if intervals is None:
+            return any(node == container for node in self.ancestors(name))
+        start, stop = intervals[container]
+        return start < intervals[name][0] < stop
+
+    def compute_intervals(self) -> dict or None:
+        """Return the mapping (power)node -> (enter, exit) times of
+        an iterative depth-first walk of the inclusion tree.
+
+        Return None if the inclusions do not describe a tree.
+
+        """
+        if any(len(parents) > 1 for parents in self.parents.values()):
+            return None  # overlapping powernodes
+        intervals = {}
+        for clock, (name, entering) in enumerate(self.depth_first()):
+            intervals[name] = clock if entering else (intervals[name], clock)
+        if len(intervals) != len(self.inclusions):
+            return None  # inclusion cycles are unreachable from the roots
+        return intervals
 
 
     def write_bubble(self, filename:str):
@@ -196,52 +622,108 @@ class BubbleTree:
         converter.tree_to_bubble(self, filename)
 
 
+    def save_binary(self, filename:str):
+        """Write in given filename a binary snapshot of this instance,
+        that can be loaded back with load_binary"""
+        from bubbletools import _binary
+        _binary.tree_to_file(self, filename)
+
+    @staticmethod
+    def load_binary(filename:str) -> 'BubbleTree':
+        """Return the BubbleTree saved in given file by save_binary.
+
+        The file is memory-mapped, and the returned tree is compact
+        (see compacted method): loading time does not depend
+        of the graph size, unless the file was written on a machine
+        of other endianness, as arrays are then converted.
+
+        """
+        from bubbletools import _binary
+        return _binary.tree_from_file(filename)
+
+
+    @staticmethod
+    def from_graph(edges:iter, nodes:iter=(), time_budget:float=None) -> 'BubbleTree':
+        """Return a BubbleTree compressing the undirected graph of given edges,
+        by greedy merging of (power)nodes with the same neighbors.
+
+        edges -- iterable of (node, node) pairs, node names being
+                 converted to strings as in bubble files
+        nodes -- other nodes of the graph, linked to nothing
+        time_budget -- number of seconds after which compression stops,
+                       returning a less compressed graph
+
+        See _compress module for details. The compression is lossless.
+
+        """
+        from bubbletools import _compress
+        edges, inclusions, roots = _compress.compress(edges, nodes, time_budget=time_budget)
+        return BubbleTree(edges=edges, inclusions=inclusions, roots=roots,
+                          oriented=False, symmetric_edges=True)
+
+
     @staticmethod
     def from_bubble_file(bblfile:str, oriented:bool=False,
-                          symmetric_edges:bool=True) -> 'BubbleTree':
+                         symmetric_edges:bool=True, use_mmap:bool=False,
+                         compact:bool=False) -> 'BubbleTree':
         """Extract data from given bubble file,
-        then call from_bubble_data method
+        then call from_bubble_data method.
+
+        The file is streamed by binary chunks (see utils.file_records),
+        through a memory map if use_mmap is True.
+
         """
-        return BubbleTree.from_bubble_data(utils.data_from_bubble(bblfile),
+        return BubbleTree.from_bubble_data(utils.file_records(bblfile, use_mmap=use_mmap),
                                            oriented=bool(oriented),
-                                           symmetric_edges=symmetric_edges)
+                                           symmetric_edges=symmetric_edges,
+                                           compact=compact)
 
 
     @staticmethod
     def from_bubble_lines(bbllines:iter, oriented:bool=False,
-                          symmetric_edges:bool=True) -> 'BubbleTree':
+                          symmetric_edges:bool=True,
+                          compact:bool=False) -> 'BubbleTree':
         """Return a BubbleTree instance.
 
         bbllines -- iterable of raw line, bubble-formatted
         oriented -- True: returned BubbleTree is oriented
+        compact -- True: returned BubbleTree is compacted
 
         """
-        return BubbleTree.from_bubble_data((utils.line_data(line)
-                                            for line in bbllines),
+        return BubbleTree.from_bubble_data(utils.line_records(bbllines),
                                            oriented=bool(oriented),
-                                           symmetric_edges=symmetric_edges)
+                                           symmetric_edges=symmetric_edges,
+                                           compact=compact)
 
 
     @staticmethod
     def from_bubble_data(bbldata:iter, oriented:bool=False,
-                         symmetric_edges:bool=True) -> 'BubbleTree':
+                         symmetric_edges:bool=True,
+                         compact:bool=False) -> 'BubbleTree':
         """Return a BubbleTree instance.
 
-        bbldata -- lines in bubble bbltree
+        bbldata -- records of bubble lines, as given by utils.line_records
         oriented -- True: returned BubbleTree is oriented
+        compact -- True: returned BubbleTree is compacted (see compacted method).
+                   Names are then interned while parsing, and links kept
+                   in integer arrays: no dict of sets is ever built.
 
         """
-        # get structure as two dicts
+        symmetric_edges = symmetric_edges and not oriented
+        if compact:
+            edges, inclusions, roots = graphs_from_records(bbldata, symmetric_edges)
+            return BubbleTree(edges=edges, inclusions=inclusions, roots=roots,
+                              oriented=oriented, symmetric_edges=symmetric_edges)
+        # get structure as two dicts, and the set of contained (power)nodes,
+        #  in one pass over the data.
         edges, inclusions = defaultdict(set), defaultdict(set)
-        used_in_edges = set()
+        included = set()
         for line in bbldata:
             if not line: continue
             ltype, *payload = line
             if ltype == 'EDGE':
                 source, target = payload
                 edges[source].add(target)
-                used_in_edges.add(source)
-                used_in_edges.add(target)
             elif ltype == 'SET':
                 setname = payload[0]
                 inclusions[setname]  # create it if not already populated
@@ -251,36 +733,30 @@ class BubbleTree:
             elif ltype == 'IN':
                 contained, container = payload
                 inclusions[container].add(contained)
-            else:  # comment, empty or error
-                if ltype not in {'COMMENT', 'EMPTY', 'ERROR'}:
+                included.add(contained)
+            else:  # comment, empty, error or extended format
+                if ltype not in {'COMMENT', 'EMPTY', 'ERROR', 'FALSEDGE', 'FALSEPOWEREDGE'}:
                     raise ValueError("The following line is not a valid "
                                      "type ({}): '{}'".format(ltype, payload))
-                else:  # it's a comment, an empty line or an error
+                else:  # it's a comment, an empty line, an error or a false edge
                     pass
 
-
-        # all (power)nodes used in edges should be present in inclusions tree
-        for node in used_in_edges:
-            if node not in inclusions:  # contains nothing, so its a node
-                inclusions[node] = ()
-
-        # all pure nodes needs to be a key in inclusions
-        for node in set(it.chain.from_iterable(inclusions.values())):
-            # an element that is not in inclusion is either:
-            #  - a node not explicitely defined in a NODE line
-            #  - a powernode that contains nothing and not explicitely defined in a SET line
-            # the second case is meaningless : this is the case for any unused powernode name.
-            # Consequently, elements not in inclusions are nodes.
+        # all (power)nodes used in edges or contained by a powernode
+        #  should be present in inclusions tree.
+        # an element that is not in inclusion is either:
+        #  - a node not explicitely defined in a NODE line
+        #  - a powernode that contains nothing and not explicitely defined in a SET line
+        # the second case is meaningless : this is the case for any unused powernode name.
+        # Consequently, elements not in inclusions are nodes.
+        for node in it.chain(edges, it.chain.from_iterable(edges.values()), included):
             if node not in inclusions:
                 inclusions[node] = ()
 
-        # find the roots
-        not_root = set(it.chain.from_iterable(inclusions.values()))
-        roots = frozenset(frozenset(inclusions.keys()) - not_root)
+        # the roots are the (power)nodes contained by nothing
+        roots = frozenset(node for node in inclusions if node not in included)
 
         # build the (oriented) bubble tree
-        symmetric_edges = symmetric_edges and not oriented
         if symmetric_edges:
             edges = utils.completed_graph(edges)
-        return BubbleTree(edges=edges, inclusions=dict(inclusions),
+        return BubbleTree(edges=edges, inclusions=inclusions,
                           roots=roots, oriented=oriented, symmetric_edges=symmetric_edges)
@@ -0,0 +1,198 @@
+"""Cache of the BubbleTree instances parsed from bubble files.
+
+Trees are compact (see BubbleTree.compacted), kept in the process,
+and optionally as binary snapshots (see BubbleTree.save_binary)
+in a directory shared between processes. The records of the false edges
+of the files (FALSEDGE and FALSEPOWEREDGE lines) are kept with the trees,
+in a JSON file next to the snapshot when there are some.
+Files are identified by their path, size and modification time,
+or by a hash of their content.
+
+"""
+
+
+import os
+import sys
+import glob
+import json
+import hashlib
+from collections import OrderedDict
+
+from bubbletools import utils
+from bubbletools.bbltree import BubbleTree
+
+
+SNAPSHOT_EXTENSION = '.bbltree'
+FALSE_EDGES_EXTENSION = '.falsedges.json'
+
+
+class ParseCache:
+    """Cache of parsed bubble files, with LRU eviction.
+
+    directory -- directory of the binary snapshots, or None to keep
+                 the trees in the process only
+    max_bytes -- budget of the trees kept in process, measured as the sum
+                 of the estimated sizes of their arrays and names
+    max_disk_bytes -- budget of the snapshots kept in directory
+    use_hash -- identify bubble files by a hash of their content,
+                instead of path, size and modification time
+
+    """
+
+    def __init__(self, directory:str=None, max_bytes:int=2**30,
+                 max_disk_bytes:int=2**34, use_hash:bool=False):
+        self.directory = directory
+        self.max_bytes, self.max_disk_bytes = int(max_bytes), int(max_disk_bytes)
+        self.use_hash = bool(use_hash)
+        self._trees = OrderedDict()  # key -> (tree, cost), least recently used first
+        self._total_bytes = 0
+        self.hits, self.disk_hits, self.misses = 0, 0, 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def stats(self) -> dict:
+        """Counters of the cache"""
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'trees': len(self._trees),
+                'bytes': self._total_bytes}
+
+    def key(self, bblfile:str, oriented:bool=False, symmetric_edges:bool=True) -> str:
+        """Return the key identifying given bubble file parsed with given options"""
+        stat = os.stat(bblfile)
+        if self.use_hash:
+            digest = hashlib.sha256()
+            with open(bblfile, 'rb') as fd:
+                for chunk in iter(lambda: fd.read(2 ** 20), b''):
+                    digest.update(chunk)
+        else:
+            digest = hashlib.sha256('{}:{}:{}'.format(
+                os.path.abspath(bblfile), stat.st_size, stat.st_mtime_ns).encode())
+        return '{}-{}{}'.format(digest.hexdigest(), int(bool(oriented)),
+                                int(bool(symmetric_edges)))
+
+    def get_tree(self, bblfile:str, oriented:bool=False,
+                 symmetric_edges:bool=True) -> BubbleTree:
+        """Return the compact BubbleTree depicted by given bubble file,
+        parsing it only if it is not in cache (see get_parsed)"""
+        return self.get_parsed(bblfile, oriented, symmetric_edges)[0]
+
+    def get_parsed(self, bblfile:str, oriented:bool=False,
+                   symmetric_edges:bool=True) -> (BubbleTree, tuple):
+        """Return the compact BubbleTree depicted by given bubble file,
+        and the records of its FALSEDGE and FALSEPOWEREDGE lines,
+        parsing it only if it is not in cache.
+
+        """
+        key = self.key(bblfile, oriented, symmetric_edges)
+        if key in self._trees:
+            self.hits += 1
+            self._trees.move_to_end(key)
+            return self._trees[key][0]
+        snapshot = os.path.join(self.directory, key + SNAPSHOT_EXTENSION) if self.directory else None
+        if snapshot and os.path.exists(snapshot):
+            self.hits += 1
+            self.disk_hits += 1
+            os.utime(snapshot)  # mark it as recently used
+            tree = BubbleTree.load_binary(snapshot)
+            false_records = _load_false_records(snapshot)
+        else:
+            self.misses += 1
+            false_records = []
+            tree = BubbleTree.from_bubble_data(
+                utils.split_false_edges(utils.file_records(bblfile), false_records),
+                oriented=oriented, symmetric_edges=symmetric_edges, compact=True)
+            false_records = tuple(false_records)
+            if snapshot:
+                self._save_snapshot(tree, false_records, snapshot)
+        parsed = tree, false_records
+        self._store(key, parsed, cost=tree_size(tree) + _records_size(false_records))
+        return parsed
+
+    def clear(self):
+        """Forget all trees kept in process. Snapshots are kept."""
+        self._trees.clear()
+        self._total_bytes = 0
+
+    def _store(self, key:str, parsed:tuple, cost:int):
+        """Keep given tree and false edge records in process,
+        evicting the least recently used ones"""
+        self._trees[key] = parsed, cost
+        self._total_bytes += cost
+        while self._total_bytes > self.max_bytes and len(self._trees) > 1:
+            _, (_, evicted_cost) = self._trees.popitem(last=False)
+            self._total_bytes -= evicted_cost
+
+    def _save_snapshot(self, tree:BubbleTree, false_records:tuple, snapshot:str):
+        """Write the snapshot of given tree and false edge records,
+        evicting the least recently used ones"""
+        tmpfile = '{}.{}.tmp'.format(snapshot, os.getpid())
+        if false_records:  # written first, so it is there when the snapshot is
+            with open(tmpfile, 'w', encoding='utf-8') as fd:
+                json.dump(false_records, fd)
+            os.replace(tmpfile, _false_records_file(snapshot))
+        tree.save_binary(tmpfile)
+        os.replace(tmpfile, snapshot)  # concurrent readers never see partial files
+        snapshots = []  # (last use, size, path)
+        for path in glob.glob(os.path.join(self.directory, '*' + SNAPSHOT_EXTENSION)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # removed by another process
+                continue
+            try:  # the false edge records are evicted with the snapshot
+                size = stat.st_size + os.path.getsize(_false_records_file(path))
+            except FileNotFoundError:
+                size = stat.st_size
+            snapshots.append((stat.st_mtime_ns, size, path))
+        snapshots.sort()
+        total = sum(size for _, size, _ in snapshots)
+        for _, size, path in snapshots[:-1]:  # always keep the newest one
+            if total <= self.max_disk_bytes:
+                break
+            for removed in (path, _false_records_file(path)):
+                try:
+                    os.remove(removed)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+
+def tree_size(tree:BubbleTree) -> int:
+    """Return an estimate of the memory used by given compact tree, in bytes.
+
+    Arrays of a memory-mapped tree are counted, although they are read
+    from its file only when needed. Computed data, like parents
+    or intervals, are not counted.
+
+    """
+    return tree.edges.nbytes(with_names=False) + tree.inclusions.nbytes()
+
+
+def _false_records_file(snapshot:str) -> str:
+    """Return the file of the false edge records saved with given snapshot"""
+    return snapshot[:-len(SNAPSHOT_EXTENSION)] + FALSE_EDGES_EXTENSION
+
+
+def _load_false_records(snapshot:str) -> tuple:
+    """Return the false edge records saved with given snapshot"""
+    try:
+        with open(_false_records_file(snapshot), encoding='utf-8') as fd:
+            return tuple(map(tuple, json.load(fd)))
+    except FileNotFoundError:  # the file had no false edges
+        return ()
+
+
+def _records_size(records:tuple) -> int:
+    """Return an estimate of the memory used by given records, in bytes"""
+    return sys.getsizeof(records) + sum(
+        sys.getsizeof(record) + sum(map(sys.getsizeof, record)) for record in records)
+
+
+def load_tree(bblfile:str, cache:ParseCache=None, oriented:bool=False,
+              symmetric_edges:bool=True) -> BubbleTree:
+    """Return the BubbleTree depicted by given bubble file,
+    using given cache if any."""
+    if cache is None:
+        return BubbleTree.from_bubble_file(bblfile, oriented=oriented,
+                                           symmetric_edges=symmetric_edges)
+    return cache.get_tree(bblfile, oriented=oriented, symmetric_edges=symmetric_edges)
@@ -1,64 +1,134 @@
-"""Routines for bubble to dot conversion"""
+"""Routines for bubble to dot conversion.
 
+Converters are imported only when used,
+so that each command only pays the imports it needs.
 
-import os
+"""
 
-from graphviz import Graph, Digraph
 
 from bubbletools.bbltree import BubbleTree
-from bubbletools import utils
-
-from bubbletools import _gexf as gexf_converter
-from bubbletools import _bubble as bubble_converter
-from bubbletools import _js as js_converter
+from bubbletools.cache import ParseCache, load_tree
 
 
 def bubble_to_dot(bblfile:str, dotfile:str=None, render:bool=False,
-                  oriented:bool=False):
-    """Write in dotfile a graph equivalent to those depicted in bubble file"""
-    tree = BubbleTree.from_bubble_file(bblfile, oriented=bool(oriented))
+                  oriented:bool=False, cache:ParseCache=None):
+    """Write in dotfile a graph equivalent to those depicted in bubble file.
+
+    cache -- a ParseCache used to get the parsed bubble file
+
+    """
+    tree = load_tree(bblfile, cache, oriented=bool(oriented))
     return tree_to_dot(tree, dotfile, render=render)
 
 
-def bubble_to_gexf(bblfile:str, gexffile:str=None, oriented:bool=False):
+def bubble_to_gexf(bblfile:str, gexffile:str=None, oriented:bool=False,
+                   cache:ParseCache=None):
     """Write in bblfile a graph equivalent to those depicted in bubble file"""
-    tree = BubbleTree.from_bubble_file(bblfile, oriented=bool(oriented))
+    from bubbletools import _gexf as gexf_converter
+    tree = load_tree(bblfile, cache, oriented=bool(oriented))
     gexf_converter.tree_to_file(tree, gexffile)
     return gexffile
 
 
-def bubble_to_js(bblfile:str, jsdir:str=None, oriented:bool=False, **style):
+def bubble_to_js(bblfile:str, jsdir:str=None, oriented:bool=False,
+                 cache:ParseCache=None, **style):
     """Write in jsdir a graph equivalent to those depicted in bubble file"""
-    js_converter.bubble_to_dir(bblfile, jsdir, oriented=bool(oriented), **style)
+    from bubbletools import _js as js_converter
+    js_converter.bubble_to_dir(bblfile, jsdir, oriented=bool(oriented),
+                               cache=cache, **style)
     return jsdir
 
 
+def bubble_to_cyjson(bblfile:str, jsonfile:str=None, oriented:bool=False,
+                     cache:ParseCache=None, compress:bool=None,
+                     max_depth:int=None, node_budget:int=None,
+                     layout:str='cose-bilkent', **style):
+    """Write in jsonfile the cytoscape.js elements, in JSON format,
+    of the graph depicted in bubble file.
+
+    compress -- gzip the file. Default is to do it if jsonfile ends with .gz
+    max_depth -- if given, show powernodes content down to this depth only,
+                 deeper powernodes being collapsed in summary nodes
+                 whose elements are written next to jsonfile
+    node_budget -- if given, collapse powernodes so that each view
+                   shows about this number of (power)nodes
+    layout -- 'cose-bilkent' to let the browser compute the layout,
+              or 'packing' to give the nodes their position
+
+    """
+    from bubbletools import _js as js_converter
+    js_converter.bubble_to_cyjson(bblfile, jsonfile, oriented=bool(oriented),
+                                  cache=cache, compress=compress, max_depth=max_depth,
+                                  node_budget=node_budget, layout=layout, **style)
+    return jsonfile
+
+
+def bubble_to_edgelist(bblfile:str, outfile:str, oriented:bool=False,
+                       cache:ParseCache=None):
+    """Write in outfile the edges of the decompressed graph
+    depicted in bubble file (see tree_to_edgelist)"""
+    tree = load_tree(bblfile, cache, oriented=bool(oriented))
+    return tree_to_edgelist(tree, outfile)
+
+
+def tree_to_edgelist(tree:BubbleTree, outfile:str):
+    """Write in outfile the edges of the decompressed graph.
+
+    If outfile ends with .npz, the CSR adjacency matrix is written,
+    with numpy and scipy (see _edgelist.tree_to_npz). Else, a TSV edge list
+    is streamed, gzipped if outfile ends with .gz.
+
+    """
+    from bubbletools import _edgelist as edgelist_converter
+    if outfile.endswith('.npz'):
+        edgelist_converter.tree_to_npz(tree, outfile)
+    else:
+        edgelist_converter.tree_to_file(tree, outfile)
+    return outfile
+
+
+def edgelist_to_bubble(edgefile:str, bblfile:str, time_budget:float=None):
+    """Write in bblfile a power graph compressing the undirected graph
+    of given TSV edge list (see BubbleTree.from_graph)"""
+    from bubbletools import _edgelist as edgelist_converter
+    tree = BubbleTree.from_graph(edgelist_converter.edges_from_file(edgefile),
+                                 time_budget=time_budget)
+    tree_to_bubble(tree, bblfile)
+    return bblfile
+
+
 def tree_to_bubble(tree:BubbleTree, bubblefile:str=None):
     """Write the graph in bubble-formatted file.
 
     """
+    from bubbletools import _bubble as bubble_converter
     bubble_converter.tree_to_file(tree, bubblefile)
 
 
 def tree_to_dot(tree:BubbleTree, dotfile:str=None, render:bool=False):
     """Write in dotfile a graph equivalent to those depicted in bubble file
 
-    See http://graphviz.readthedocs.io/en/latest/examples.html#cluster-py
-    for graphviz API
+    The dot file is written directly, in a streaming way.
+    The graphviz package is needed only to render it.
 
     """
-    graph = tree_to_graph(tree)
+    from bubbletools import _dot as dot_converter
     path = None
     if dotfile:  # first save the dot file.
-        path = graph.save(dotfile)
+        dot_converter.tree_to_file(tree, dotfile)
+        path = dotfile
     if render:  # secondly, show it.
-        # As the dot file is known by the Graph object,
-        # it will be placed around the dot file.
-        graph.view()
+        # As the dot file is known by the Source object,
+        # rendering will be placed around the dot file.
+        from graphviz import Source
+        if dotfile:
+            Source.from_file(dotfile).view()
+        else:
+            Source(dot_converter.tree_to_dot(tree), filename='graph.gv').view()
     return path
 
 
-def tree_to_graph(bbltree:BubbleTree) -> Graph or Digraph:
+def tree_to_graph(bbltree:BubbleTree) -> 'graphviz.Graph or graphviz.Digraph':
     """Compute as a graphviz.Graph instance the given graph.
 
     If given BubbleTree instance is oriented, returned value
@@ -68,6 +138,7 @@ def tree_to_graph(bbltree:BubbleTree) -> Graph or Digraph:
     for graphviz API
 
     """
+    from graphviz import Graph, Digraph
     GraphObject = Digraph if bbltree.oriented else Graph
     def create(name:str):
         """Return a graphviz graph figurating a powernode"""
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from bubbletools import batch
+
+
+BUBBLE = 'IN\ta\tp1\nIN\tb\tp1\nEDGE\tp1\tc\t1.0\n'
+
+
+def test_expand_inputs(tmp_path):
+    for name in ('one.bbl', 'two.bbl', 'other.txt'):
+        (tmp_path / name).write_text(BUBBLE)
+    expected = (str(tmp_path / 'one.bbl'), str(tmp_path / 'two.bbl'))
+    assert batch.expand_inputs([str(tmp_path)]) == expected
+    assert batch.expand_inputs([str(tmp_path / '*.bbl'), expected[0]]) == expected
+    assert batch.expand_inputs(['missing.bbl']) == ('missing.bbl',)
+
+
+def test_run_batch(tmp_path):
+    (tmp_path / 'one.bbl').write_text(BUBBLE)
+    (tmp_path / 'two.bbl').write_text(BUBBLE + 'IN\tc\tp2\n')
+    inputs = [str(tmp_path), str(tmp_path / 'missing.bbl')]
+    outdir = str(tmp_path / 'out')
+    for workers in (1, 2):
+        results = tuple(batch.run_batch('gexf', inputs, outdir=outdir, workers=workers))
+        assert [os.path.basename(r.bblfile) for r in results] == ['one.bbl', 'two.bbl', 'missing.bbl']
+        assert results[0].error is None and results[1].error is None
+        assert results[2].error.startswith('FileNotFoundError')
+        assert os.path.exists(os.path.join(outdir, 'one.gexf'))
+        assert os.path.exists(os.path.join(outdir, 'two.gexf'))
+    results = tuple(batch.run_batch('validate', [str(tmp_path / 'two.bbl')], workers=1))
+    assert results[0].outfile is None
+    assert results[0].logs == ("WARNING singleton powernode: p2 is defined, but contains only {'c'}",)
+
+
+def test_run_batch_output_collision(tmp_path):
+    for subdir in ('a', 'b'):
+        (tmp_path / subdir).mkdir()
+        (tmp_path / subdir / 'x.bbl').write_text(BUBBLE)
+    inputs = [str(tmp_path / 'a'), str(tmp_path / 'b')]
+    with pytest.raises(ValueError, match='x.gexf'):
+        tuple(batch.run_batch('gexf', inputs, outdir=str(tmp_path / 'out'), workers=1))
+    assert not os.path.exists(str(tmp_path / 'out' / 'x.gexf'))
+    # no collision without outdir, nor without output files
+    assert len(tuple(batch.run_batch('gexf', inputs, workers=1))) == 2
+    assert len(tuple(batch.run_batch('validate', inputs, outdir=str(tmp_path / 'out'), workers=1))) == 2
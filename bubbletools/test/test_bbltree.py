@@ -1,7 +1,11 @@
 
 
+import random
+import weakref
+import itertools as it
+
 import pytest
-from bubbletools import bbltree
+from bubbletools import bbltree, utils
 
 
 BUBBLE_DATA = (
@@ -46,6 +50,11 @@ def triple_inclusion():
     return bbltree.BubbleTree.from_bubble_data(BUBBLE_TRIPLE_INCLUSION)
 
 
+@pytest.fixture
+def compact_powergraph():
+    return bbltree.BubbleTree.from_bubble_data(BUBBLE_DATA, compact=True)
+
+
 @pytest.fixture
 def oriented_powergraph():
     return bbltree.BubbleTree.from_bubble_data(BUBBLE_DATA, oriented=True)
@@ -57,6 +66,26 @@ def test_containment_primitives(powergraph):
     assert set(powergraph.powernodes_in('p1')) == {'p3'}
 
 
+def test_traversals(triple_inclusion):
+    assert tuple(triple_inclusion.preorder('p2')) in {('p2', 'b', 'p3', 'c'), ('p2', 'p3', 'c', 'b')}
+    assert tuple(triple_inclusion.postorder('p2')) in {('b', 'c', 'p3', 'p2'), ('c', 'p3', 'b', 'p2')}
+    assert tuple(triple_inclusion.levelorder('p2'))[:1] == ('p2',)
+    assert tuple(triple_inclusion.levelorder('p2'))[-1] == 'c'
+    assert set(triple_inclusion.preorder()) == set(triple_inclusion.inclusions)
+
+
+def test_deep_hierarchy():
+    depth = 5000
+    data = [('IN', 'p{}'.format(idx+1), 'p{}'.format(idx)) for idx in range(depth)]
+    data.append(('IN', 'a', 'p{}'.format(depth)))
+    tree = bbltree.BubbleTree.from_bubble_data(data)
+    assert set(tree.nodes_in('p0')) == {'a'}
+    assert sum(1 for _ in tree.all_in('p0')) == depth + 1
+    assert tree.leaf_count('p0') == 1
+    assert tree.is_in('a', 'p0')
+    assert tuple(tree.postorder())[-1] == 'p0'
+
+
 def test_powernode_data(powergraph):
     data = powergraph.powernode_data('p2')
     assert data.size == 4
@@ -64,16 +93,179 @@ def test_powernode_data(powergraph):
     assert data.contained_pnodes == {'p4'}
     assert data.contained_nodes == {'h', 'g', 'f', 'e'}
 
+def test_leaves(powergraph, triple_inclusion):
+    assert powergraph.leaves('p1') == {'a', 'b', 'c', 'd'}
+    assert powergraph.leaves('k') == frozenset()
+    assert powergraph.leaf_counts == {name: len(powergraph.leaves(name))
+                                      for name in powergraph.inclusions}
+    assert triple_inclusion.leaf_count('p1') == 3
+    assert triple_inclusion.leaf_count('a') == 0
+
+
+def test_leaves_invalidation(powergraph):
+    assert powergraph.leaf_count('p4') == 2
+    assert powergraph.leaves('p2') == {'e', 'f', 'g', 'h'}
+    powergraph.inclusions['p4'].add('i')
+    powergraph.inclusions['i'] = ()
+    powergraph.invalidate_cache()
+    assert powergraph.leaf_count('p4') == 3
+    assert powergraph.leaf_count('p2') == 5
+    assert powergraph.leaves('p2') == {'e', 'f', 'g', 'h', 'i'}
+    assert set(powergraph.powernodes_containing('i')) == {'p2', 'p4'}
+
+
 def test_powergraph_reduction(powergraph):
     assert powergraph.edge_reduction == 0.75
     assert powergraph.init_edge_number() == 12
     assert powergraph.edge_number() == 3
 
+
+def test_init_edge_number_approximate_random_tree(monkeypatch):
+    rng = random.Random(42)
+    data = [('IN', 'p{}'.format(idx), 'p{}'.format(rng.randrange(idx))) for idx in range(1, 300)]
+    data += [('IN', str(node), 'p{}'.format(rng.randrange(300))) for node in range(6000)]
+    data += [('EDGE', 'p{}'.format(rng.randrange(300)), 'p{}'.format(rng.randrange(300)))
+             for _ in range(40)]
+    data += [('EDGE', str(rng.randrange(6000)), str(rng.randrange(6000))) for _ in range(200)]
+    tree = bbltree.BubbleTree.from_bubble_data(data)
+    expected = tree.init_edge_number()
+    live, peak = weakref.WeakSet(), [0]
+    class CountedHyperLogLog(utils.HyperLogLog):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            live.add(self)
+            peak[0] = max(peak[0], len(live))
+    monkeypatch.setattr(utils, 'HyperLogLog', CountedHyperLogLog)
+    assert abs(tree.init_edge_number(approximate=True) - expected) < 0.05 * expected
+    assert peak[0] < 150  # sketches of unlinked powernodes are dropped once used
+
+
+@pytest.mark.parametrize('extra, oriented', [
+    ((), False),
+    ((), True),
+    ((('IN', 'a', 'p4'), ('EDGE', 'p4', 'p1')), False),  # overlapping powernodes
+    ((('EDGE', 'p3', 'p1'), ('EDGE', 'k', 'k')), False),  # self-loops
+    ((('IN', 'p1', 'p3'), ('EDGE', 'g', 'p1')), False),  # inclusion cycle
+])
+def test_init_edge_number(extra, oriented):
+    tree = bbltree.BubbleTree.from_bubble_data(BUBBLE_DATA + extra, oriented=oriented)
+    expected = len(frozenset(frozenset(edge) for edge in tree.initial_edges()))
+    assert tree.init_edge_number() == expected
+    assert tree.compacted().init_edge_number() == expected
+    assert tree.init_edge_number(approximate=True) == expected  # small sets are exact
+    counts = {node: count for node, count, _ in tree.neighbor_counts()}
+    assert set(counts) == set(tree.nodes())
+
+
+def test_init_edge_number_approximate():
+    data = [('IN', str(node), 'p{}'.format(node % 3)) for node in range(2000)]
+    data += [('EDGE', 'p0', 'p1'), ('EDGE', 'p1', 'p2'), ('EDGE', '0', '1'), ('IN', 'p1', 'p3')]
+    tree = bbltree.BubbleTree.from_bubble_data(data + [('IN', 'p2', 'p3')])
+    assert tree.intervals is not None
+    expected = 667 * 667 + 667 * 666  # edge 0-1 is in p0-p1
+    assert tree.init_edge_number() == expected
+    assert abs(tree.init_edge_number(approximate=True) - expected) < 0.05 * expected
+    tree = bbltree.BubbleTree.from_bubble_data(data + [('IN', '0', 'p3')])  # overlapping
+    assert tree.intervals is None
+    assert tree.init_edge_number() == expected
+    assert abs(tree.init_edge_number(approximate=True) - expected) < 0.05 * expected
+
+
+@pytest.mark.parametrize('extra, oriented', [
+    ((), False),
+    ((), True),
+    ((('IN', 'a', 'p4'), ('EDGE', 'p4', 'p1')), False),  # overlapping powernodes
+    ((('IN', 'a', 'p4'), ('EDGE', 'p4', 'p1')), True),
+    ((('EDGE', 'p3', 'p1'), ('EDGE', 'k', 'k')), False),  # self-loops
+])
+def test_adjacency_queries(extra, oriented):
+    tree = bbltree.BubbleTree.from_bubble_data(BUBBLE_DATA + extra, oriented=oriented)
+    edges = set(tree.initial_edges())
+    if not oriented:
+        edges |= {(target, source) for source, target in edges}
+    degrees = tree.degrees()
+    assert set(degrees) == set(tree.nodes())
+    for node in tree.nodes():
+        expected = frozenset(target for source, target in edges if source == node)
+        assert tree.neighbors(node) == expected
+        assert tree.degree(node) == degrees[node] == len(expected)
+        for other in tree.nodes():
+            assert tree.has_edge(node, other) == ((node, other) in edges)
+
+
+def test_adjacency_queries_examples(powergraph, oriented_powergraph):
+    assert powergraph.has_edge('a', 'e') and powergraph.has_edge('e', 'a')
+    assert powergraph.has_edge('k', 'h') and not powergraph.has_edge('a', 'h')
+    assert oriented_powergraph.has_edge('a', 'e') and not oriented_powergraph.has_edge('e', 'a')
+    assert powergraph.neighbors('c') == {'k'}
+    assert powergraph.neighbors('k') == {'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'}
+    assert oriented_powergraph.neighbors('e') == frozenset()
+    assert powergraph.compacted().degrees() == powergraph.degrees()
+    with pytest.raises(ValueError):
+        powergraph.neighbors('p1')
+    with pytest.raises(ValueError):
+        powergraph.has_edge('k', 'unknown')
+
+
+
+def test_from_graph_lossless():
+    rand = random.Random(42)
+    for _ in range(300):
+        nb_nodes, density = rand.randint(1, 12), rand.random()
+        edges = [(str(a), str(b)) for a in range(nb_nodes) for b in range(a, nb_nodes)
+                 if rand.random() < density and (a != b or rand.random() < 0.3)]
+        tree = bbltree.BubbleTree.from_graph(edges, nodes=map(str, range(nb_nodes)))
+        assert set(tree.nodes()) == set(map(str, range(nb_nodes)))
+        assert {frozenset(edge) for edge in tree.initial_edges()} == {frozenset(edge) for edge in edges}
+        assert tree.edge_number() <= len(edges)
+
+
+def test_from_graph_motifs():
+    biclique = bbltree.BubbleTree.from_graph((a, b) for a in range(10) for b in range(10, 30))
+    assert biclique.edge_number() == 1 and biclique.init_edge_number() == 200
+    assert sorted(map(len, map(biclique.leaves, biclique.roots))) == [10, 20]
+    clique = bbltree.BubbleTree.from_graph(it.combinations(range(16), 2))
+    assert clique.edge_number() == 15 and clique.init_edge_number() == 120
+    assert not clique.has_edge('3', '3') and clique.has_edge('3', '4')
+    looped_clique = bbltree.BubbleTree.from_graph(it.combinations_with_replacement(range(16), 2))
+    assert looped_clique.edge_number() == 1 and looped_clique.has_edge('3', '3')
+    star = bbltree.BubbleTree.from_graph(('center', leaf) for leaf in range(8))
+    assert star.edge_number() == 1 and star.degree('center') == 8
+    uncompressed = bbltree.BubbleTree.from_graph(it.combinations(range(16), 2), time_budget=0)
+    assert uncompressed.edge_number() == 120 and not tuple(uncompressed.powernodes())
+
+
 def test_powernodes_containing(powergraph):
     assert set(powergraph.powernodes_containing('f')) == {'p2', 'p4'}
     assert set(powergraph.powernodes_containing('h')) == {'p2'}
 
 
+def test_powernodes_containing_directly(powergraph, triple_inclusion):
+    assert set(powergraph.powernodes_containing('f', directly=True)) == {'p4'}
+    assert set(powergraph.powernodes_containing('p4', directly=True)) == {'p2'}
+    assert set(powergraph.powernodes_containing('k', directly=True)) == set()
+    assert tuple(triple_inclusion.ancestors('c')) == ('p3', 'p2', 'p1')
+
+
+def test_is_in(powergraph, triple_inclusion):
+    assert powergraph.intervals is not None
+    assert powergraph.is_in('f', 'p2')
+    assert powergraph.is_in('a', 'p1')
+    assert not powergraph.is_in('a', 'p2')
+    assert not powergraph.is_in('p2', 'p2')
+    assert not powergraph.is_in('p1', 'a')
+    assert triple_inclusion.is_in('c', 'p1')
+    assert not triple_inclusion.is_in('a', 'p3')
+
+
+def test_is_in_overlapping():
+    tree = bbltree.BubbleTree.from_bubble_data(BUBBLE_DATA + (('IN', 'a', 'p4'),))
+    assert tree.intervals is None
+    assert tree.is_in('a', 'p2')
+    assert tree.is_in('a', 'p1')
+    assert set(tree.powernodes_containing('a')) == {'p1', 'p2', 'p3', 'p4'}
+
+
 def test_no_powernode_data(powergraph):
     with pytest.raises(ValueError):
         powergraph.powernode_data('k')
@@ -121,3 +313,87 @@ def test_from_oriented_bubble_data(oriented_powergraph):
     assert len(subroots) == 1
     assert len(next(iter(subroots.values()))) == 2
     assert next(iter(subroots.keys())) == next(iter(cc.keys()))
+
+
+def test_connected_components_cache():
+    tree = bbltree.BubbleTree.from_bubble_data((
+        ('IN', 'a', 'p1'), ('IN', 'b', 'p1'), ('EDGE', 'p1', 'c'),
+        ('EDGE', 'd', 'd'), ('NODE', 'e'), ('EDGE', 'f', 'c'),
+    ))
+    cc, subroots = tree.connected_components()
+    assert sorted(map(sorted, cc.values())) == [['a', 'b', 'c', 'f', 'p1'], ['d'], ['e']]
+    assert list(subroots.values()) == [{'p1', 'c', 'f'} - {next(iter(subroots))}]
+    assert tree.connected_components() is tree.connected_components()
+    tree.edges['c'].add('e')
+    tree.edges['e'] = {'c'}
+    tree.invalidate_cache()
+    assert len(tree.connected_components()[0]) == 2
+
+
+def test_compact_powergraph(powergraph, compact_powergraph):
+    assert compact_powergraph.is_compact and not powergraph.is_compact
+    assert compact_powergraph.edges == powergraph.edges
+    assert compact_powergraph.inclusions == powergraph.inclusions
+    assert compact_powergraph.parents == powergraph.parents
+    assert compact_powergraph.roots == powergraph.roots
+    assert compact_powergraph.inclusions['k'] == ()
+    assert 'p4' in compact_powergraph.inclusions['p2']
+    assert 'p3' not in compact_powergraph.inclusions['p2']
+    assert 'unknown' not in compact_powergraph.edges
+    assert len(compact_powergraph.edges) == len(powergraph.edges)
+    assert compact_powergraph.edge_reduction == powergraph.edge_reduction
+    assert compact_powergraph.leaves('p1') == powergraph.leaves('p1')
+    assert set(compact_powergraph.powernodes_containing('f')) == {'p2', 'p4'}
+    assert powergraph.compacted().edges == powergraph.edges
+    cc, subroots = compact_powergraph.connected_components()
+    assert len(cc) == 1 and len(next(iter(subroots.values()))) == 2
+
+
+@pytest.mark.parametrize('oriented', [False, True])
+@pytest.mark.parametrize('symmetric_edges', [False, True])
+def test_compact_parsing(oriented, symmetric_edges):
+    lines = ('SET\tp1\t1.0', 'SET\tempty\t1.0', 'NODE\tn', 'IN\ta\tp1', 'IN\tb\tp1', 'IN\tp1\tp2',
+             'EDGE\tp1\tc\t1.0', 'EDGE\tp1\tc\t1.0', 'EDGE\tc\ta\t1.0', '# comment',
+             'FALSEDGE\ta\tb')
+    tree = bbltree.BubbleTree.from_bubble_lines(lines, oriented, symmetric_edges)
+    compact = bbltree.BubbleTree.from_bubble_lines(lines, oriented, symmetric_edges, compact=True)
+    assert compact.is_compact
+    assert compact.symmetric_edges == tree.symmetric_edges
+    assert compact.edges == tree.edges and compact.inclusions == tree.inclusions
+    assert compact.roots == tree.roots == {'p2', 'empty', 'n', 'c'}
+    with pytest.raises(ValueError):
+        bbltree.BubbleTree.from_bubble_data([('UNKNOWN', 'a')], compact=True)
+
+
+@pytest.mark.parametrize('oriented', [False, True])
+def test_binary_snapshot(tmp_path, oriented):
+    tree = bbltree.BubbleTree.from_bubble_data(BUBBLE_DATA + (('IN', 'é', 'p4'),), oriented=oriented)
+    filename = str(tmp_path / 'tree.bin')
+    tree.save_binary(filename)
+    loaded = bbltree.BubbleTree.load_binary(filename)
+    assert loaded.is_compact
+    assert loaded.oriented == tree.oriented
+    assert loaded.symmetric_edges == tree.symmetric_edges
+    assert loaded.roots == tree.roots and 'p1' in loaded.roots and 'a' not in loaded.roots
+    assert loaded.roots - {'p1'} == tree.roots - {'p1'}
+    assert loaded.edges == tree.edges
+    assert loaded.inclusions == tree.inclusions
+    assert loaded.leaves('p2') == {'e', 'f', 'g', 'h', 'é'}
+    assert loaded.edge_reduction == tree.edge_reduction
+    # a loaded tree can be saved again
+    loaded.save_binary(filename + '2')
+    assert (tmp_path / 'tree.bin2').read_bytes() == (tmp_path / 'tree.bin').read_bytes()
+
+
+def test_binary_snapshot_bad_file(tmp_path):
+    filename = tmp_path / 'tree.bin'
+    filename.write_bytes(b'EDGE\ta\tb\t1.0\n' * 10)
+    with pytest.raises(ValueError):
+        bbltree.BubbleTree.load_binary(str(filename))
+    # a valid snapshot, truncated
+    bbltree.BubbleTree.from_bubble_data(BUBBLE_DATA).save_binary(str(filename))
+    snapshot = filename.read_bytes()
+    for size in (len(snapshot) - 4, len(snapshot) // 2, 80):
+        filename.write_bytes(snapshot[:size])
+        with pytest.raises(ValueError, match='truncated'):
+            bbltree.BubbleTree.load_binary(str(filename))
@@ -0,0 +1,98 @@
+import os
+
+from bubbletools import utils, converter, _js
+from bubbletools.cache import ParseCache, tree_size
+
+
+BUBBLE = 'IN\ta\tp1\nIN\tb\tp1\nEDGE\tp1\tc\t1.0\n'
+
+
+def test_in_process_cache(tmp_path):
+    bblfile = tmp_path / 'test.bbl'
+    bblfile.write_text(BUBBLE)
+    cache = ParseCache()
+    tree = cache.get_tree(str(bblfile))
+    assert tree.is_compact
+    assert cache.get_tree(str(bblfile)) is tree
+    assert cache.get_tree(str(bblfile), oriented=True) is not tree
+    assert (cache.hits, cache.misses) == (1, 2)
+    # a modified file is parsed again
+    bblfile.write_text(BUBBLE + 'IN\tc\tp2\nIN\td\tp2\n')
+    os.utime(str(bblfile), ns=(0, 0))
+    assert 'p2' in cache.get_tree(str(bblfile)).inclusions
+    assert cache.misses == 3
+
+
+def test_lru_eviction(tmp_path):
+    files = []
+    for idx in range(3):
+        files.append(str(tmp_path / '{}.bbl'.format(idx)))
+        with open(files[-1], 'w') as fd:
+            fd.write(BUBBLE)
+    probe = ParseCache()
+    size = tree_size(probe.get_tree(files[0]))
+    assert probe.stats['bytes'] >= size
+    size = probe.stats['bytes']
+    cache = ParseCache(max_bytes=2 * size)
+    for bblfile in files:
+        cache.get_tree(bblfile)
+    assert cache.stats['trees'] == 2
+    cache.get_tree(files[2])
+    cache.get_tree(files[0])
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert cache.stats['bytes'] == 2 * size
+
+
+def test_disk_cache(tmp_path):
+    bblfile = tmp_path / 'test.bbl'
+    bblfile.write_text(BUBBLE)
+    directory = str(tmp_path / 'cache')
+    tree = ParseCache(directory).get_tree(str(bblfile))
+    # another process would use the snapshot
+    cache = ParseCache(directory, use_hash=True)
+    cache.get_tree(str(bblfile))
+    cache = ParseCache(directory)
+    loaded = cache.get_tree(str(bblfile))
+    assert (cache.hits, cache.disk_hits, cache.misses) == (1, 1, 0)
+    assert loaded.is_compact
+    assert loaded.inclusions == tree.inclusions and loaded.edges == tree.edges
+    assert len(os.listdir(directory)) == 2  # one per key kind
+    ParseCache(directory, max_disk_bytes=0).get_tree(str(tmp_path / 'test.bbl'), oriented=True)
+    assert len(os.listdir(directory)) == 1
+
+
+def test_converter_with_cache(tmp_path):
+    bblfile = tmp_path / 'test.bbl'
+    bblfile.write_text(BUBBLE)
+    cache = ParseCache()
+    converter.bubble_to_gexf(str(bblfile), str(tmp_path / 'a.gexf'), cache=cache)
+    converter.bubble_to_gexf(str(bblfile), str(tmp_path / 'b.gexf'), cache=cache)
+    assert (tmp_path / 'a.gexf').read_text() == (tmp_path / 'b.gexf').read_text()
+    assert cache.stats['hits'] == 1
+
+
+def test_js_with_cache_reads_once(tmp_path, monkeypatch):
+    bblfile = tmp_path / 'test.bbl'
+    bblfile.write_text(BUBBLE + 'FALSEDGE\ta\tb\nFALSEPOWEREDGE\tp1\tc\ta\tc\n')
+    reads = []
+    file_records = utils.file_records
+    def counting_file_records(*args, **kwargs):
+        reads.append(args)
+        return file_records(*args, **kwargs)
+    monkeypatch.setattr(utils, 'file_records', counting_file_records)
+    directory = str(tmp_path / 'cache')
+    expected = _js.read_bubble(str(bblfile))
+    assert expected[1:] == ([('a', 'b')], {frozenset(('p1', 'c')): {('a', 'c')}})
+    cache = ParseCache(directory)
+    for _ in range(2):
+        assert _js.read_bubble(str(bblfile), cache=cache)[1:] == expected[1:]
+    assert len(reads) == 2  # without cache, then at the first call with cache
+    # another process uses the snapshot and its false edges
+    tree, *false_edges = _js.read_bubble(str(bblfile), cache=ParseCache(directory))
+    assert tree.is_compact and false_edges == list(expected[1:])
+    assert len(reads) == 2
+    assert len(os.listdir(directory)) == 2  # snapshot and false edge records
+    cache = ParseCache(directory, max_disk_bytes=0)
+    cache.get_tree(str(bblfile), oriented=True)
+    key = cache.key(str(bblfile), oriented=True)
+    assert sorted(os.listdir(directory)) == [key + '.bbltree', key + '.falsedges.json']
@@ -0,0 +1,265 @@
+import json
+import math
+import random
+import gzip
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from bubbletools import BubbleTree
+from bubbletools import _dot
+from bubbletools import _edgelist
+from bubbletools import _gexf
+from bubbletools import converter
+from bubbletools import _js
+from bubbletools import _layout
+
+
+BUBBLE_LINES = (
+    'IN\ta\tp1',
+    'IN\tb&c\tp1',
+    'IN\t"d"\tp2',
+    'IN\te\tp2',
+    'IN\tp2\tp1',
+    'EDGE\tk\tp1\t1.0',
+    'EDGE\ta\t"d"\t1.0',
+    'EDGE\te\tk\t1.0',
+)
+
+
+@pytest.fixture
+def tree():
+    return BubbleTree.from_bubble_lines(BUBBLE_LINES)
+
+
+def test_gexf(tree, tmp_path):
+    outfile = tmp_path / 'out.gexf'
+    _gexf.tree_to_file(tree, str(outfile))
+    assert outfile.read_text() == _gexf.tree_to_gexf(tree)
+    ns = {'gexf': 'http://www.gexf.net/1.2draft'}
+    graph = ET.parse(str(outfile)).getroot().find('gexf:graph', ns)
+    assert graph.get('defaultedgetype') == 'undirected'
+    nodes = {node.get('id'): node for node in graph.iter('{%s}node' % ns['gexf'])}
+    assert set(nodes) == {'p1', 'p2', 'a', 'b&c', '"d"', 'e', 'k'}
+    subnodes = nodes['p2'].iter('{%s}node' % ns['gexf'])
+    assert {node.get('id') for node in subnodes} == {'p2', '"d"', 'e'}
+    edges = tuple(graph.iter('{%s}edge' % ns['gexf']))
+    assert len(edges) == 3
+    assert len({edge.get('id') for edge in edges}) == 3
+
+
+def test_dot(tree, tmp_path):
+    outfile = tmp_path / 'out.dot'
+    assert converter.tree_to_dot(tree, str(outfile)) == str(outfile)
+    lines = outfile.read_text().splitlines()
+    assert lines[0] == 'graph "graph" {' and lines[-1] == '}'
+    assert sum(line.count('{') for line in lines) == sum(line.count('}') for line in lines)
+    # clusters are nested following the inclusions
+    start = lines.index('\tsubgraph cluster_p1 {')
+    stop = lines.index('\t}', start)
+    assert '\t\tsubgraph cluster_p2 {' in lines[start:stop]
+    assert {'\t\t\t"\\"d\\""', '\t\t\te', '\t\ta', '\t\t"b&c"'} < set(lines[start:stop])
+    edges = {line.strip() for line in lines if ' -- ' in line}
+    assert edges == {'k -- p1 [lhead=cluster_p1]', '"\\"d\\"" -- a', 'e -- k'}
+
+
+def test_dot_lines():
+    assert _dot.quote('a b') == '"a b"'
+    assert _dot.quote('say "hi"') == '"say \\"hi\\""'
+    assert _dot.quote('Node') == '"Node"' and _dot.quote('n_1') == 'n_1'
+    tree = BubbleTree.from_bubble_lines(('IN\ta b\tp 1', 'IN\tc\tp2', 'EDGE\tp 1\tp2\t1.0',
+                                         'EDGE\tx\tp2\t1.0'), oriented=True)
+    lines = tuple(_dot.dot_lines(tree))
+    assert lines[0] == 'digraph "graph" {\n\tgraph [compound=true]\n' and lines[-1] == '}\n'
+    assert all(line.endswith('\n') for line in lines)
+    assert '\tsubgraph "cluster_p 1" {\n' in lines
+    assert '\t\t"p 1" [shape=point style=invis]\n' in lines
+    assert '\t\t"a b"\n' in lines
+    assert '\t"p 1" -> p2 [lhead=cluster_p2 ltail="cluster_p 1"]\n' in lines
+    assert '\tx -> p2 [lhead=cluster_p2]\n' in lines
+    assert _dot.tree_to_dot(tree) == ''.join(lines)
+
+
+def test_oriented_gexf(tmp_path):
+    tree = BubbleTree.from_bubble_lines(BUBBLE_LINES, oriented=True)
+    root = ET.fromstring(_gexf.tree_to_gexf(tree))
+    edges = {(edge.get('source'), edge.get('target'))
+             for edge in root.iter('{http://www.gexf.net/1.2draft}edge')}
+    assert edges == {('k', 'p1'), ('a', '"d"'), ('e', 'k')}
+
+
+def test_js_clique_falsedges(tmp_path):
+    bblfile = tmp_path / 'cliques.bbl'
+    bblfile.write_text('\n'.join((
+        'IN\ta\tp1', 'IN\tp2\tp1', 'IN\tx\tp2', 'IN\ty\tp2', 'IN\tz\tp2',
+        'EDGE\tp1\tp1\t1.0', 'EDGE\tp2\tp2\t1.0', 'EDGE\tp1\tb\t1.0',
+        'FALSEDGE\tx\ty', 'FALSEDGE\ta\tz', 'FALSEPOWEREDGE\tp1\tb\tx\tb',
+    )))
+    lines = tuple(_js.bbl_to_cys(str(bblfile)))
+    elements = [json.loads(line.strip().rstrip(',')) for line in lines
+                if line.strip().startswith('{"group"')]
+    nodes = {elem['data']['id']: elem['data'] for elem in elements if elem['group'] == 'nodes'}
+    assert nodes['p2'] == {'id': 'p2', 'parent': 'p1', 'type': 'clique', 'falsedges': [['x', 'y']]}
+    assert nodes['p1'] == {'id': 'p1', 'type': 'clique', 'falsedges': [['a', 'z']]}
+    assert len(nodes) == 7
+    edges = [elem['data'] for elem in elements if elem['group'] == 'edges']
+    assert len(edges) == 1 and edges[0]['falsedges'] == [['x', 'b']]
+
+
+def test_clique_falsedges_unknown_target():
+    tree = BubbleTree.from_bubble_lines(('IN\ta\tp1', 'IN\tb\tp1', 'EDGE\tp1\tp1\t1.0'))
+    assert tree.intervals is not None
+    assert _js.find_clique_falsedges(tree, [('a', 'unknown'), ('a', 'b')]) == {'p1': [['a', 'b']]}
+
+
+@pytest.mark.parametrize('jsonfile', ['elements.json', 'elements.json.gz'])
+def test_cyjson(tmp_path, jsonfile):
+    bblfile = tmp_path / 'escaped.bbl'
+    bblfile.write_text('\n'.join(BUBBLE_LINES + ("IN\tl'\\</script>\tp2",)))
+    outfile = str(tmp_path / jsonfile)
+    _js.bubble_to_cyjson(str(bblfile), outfile)
+    opener = gzip.open if jsonfile.endswith('.gz') else open
+    with opener(outfile, 'rt') as fd:
+        elements = json.load(fd)
+    nodes = {elem['data']['id']: elem['data'] for elem in elements if elem['group'] == 'nodes'}
+    assert set(nodes) == {'p1', 'p2', 'a', 'b&c', '"d"', 'e', 'k', "l'\\</script>"}
+    assert nodes["l'\\</script>"]['parent'] == 'p2'
+    edges = {(elem['data']['source'], elem['data']['target'])
+             for elem in elements if elem['group'] == 'edges'}
+    assert edges == {('k', 'p1'), ('a', '"d"'), ('e', 'k')}
+
+
+def test_js_external_elements(tmp_path):
+    bblfile = tmp_path / 'graph.bbl'
+    bblfile.write_text('\n'.join(BUBBLE_LINES))
+    site = tmp_path / 'site'
+    _js.bubble_to_dir(str(bblfile), str(site), external_elements=True, compress=True)
+    graph_js = (site / 'js' / 'graph.js').read_text()
+    assert 'load_elements("elements.json.gz")' in graph_js
+    assert 'elements: elements,' in graph_js
+    with gzip.open(str(site / 'elements.json.gz'), 'rt') as fd:
+        assert len(json.load(fd)) == 10
+    with pytest.raises(ValueError):
+        _js.bubble_to_dir(str(bblfile), str(tmp_path / 'graph.js'), external_elements=True)
+
+
+def test_lod_views(tree):
+    views, view_of = _js.lod_views(tree, max_depth=0)
+    assert [view.container for view in views] == [None, 'p1', 'p2']
+    assert [view.parent for view in views] == [None, 0, 1]
+    assert views[0].nodes == [('k', None), ('p1', None)]
+    assert views[0].collapsed == {'p1'} and views[1].collapsed == {'p2'}
+    assert set(view_of) == set(tree.inclusions)
+    assert _js.lod_views(tree, node_budget=5)[0][0].collapsed == {'p2'}
+    full_views, _ = _js.lod_views(tree)
+    assert len(full_views) == 1 and not full_views[0].collapsed
+
+
+def test_lod_elements(tree):
+    def edges_of(elements):
+        return {(elem['data']['source'], elem['data']['target']): elem['data']
+                for elem in elements if elem['group'] == 'edges'}
+    views = list(_js.lod_elements(tree, max_depth=0))
+    assert len(views) == 3
+    summary = next(elem for elem in views[0] if elem['data']['id'] == 'p1')
+    assert summary['classes'] == 'summary' and summary['data']['chunk'] == 'chunks/1.json'
+    assert summary['data']['leaves'] == 4
+    # k-p1 (cover 4) and e-k (cover 1) are aggregated, a-"d" is inside p1
+    assert edges_of(views[0]) == {('k', 'p1'): {
+        'source': 'k', 'target': 'p1', 'width': 7, 'label': 'cover: 5',
+        'type': 'poweredge', 'via': ['p1'], 'edges': 2}}
+    edges = edges_of(views[1])
+    assert set(edges) == {('k', 'p2'), ('a', 'p2')}
+    assert edges['a', 'p2']['via'] == ['p2']
+    assert set(edges_of(views[2])) == {('e', 'k'), ('"d"', 'a')}
+    assert not any('via' in data for data in edges_of(views[2]).values())
+
+
+def test_lod_website(tmp_path):
+    bblfile = tmp_path / 'graph.bbl'
+    bblfile.write_text('\n'.join(BUBBLE_LINES))
+    site = tmp_path / 'site'
+    _js.bubble_to_dir(str(bblfile), str(site), max_depth=0)
+    assert "cy.on('tap', 'node.summary'" in (site / 'js' / 'graph.js').read_text()
+    with open(str(site / 'elements.json')) as fd:
+        elements = json.load(fd)
+    assert {elem['data'].get('chunk') for elem in elements} == {None, 'elements.chunks/1.json'}
+    assert sorted(path.name for path in (site / 'elements.chunks').iterdir()) == ['1.json', '2.json']
+
+
+def test_pack_without_overlap():
+    rand = random.Random(42)
+    radii = tuple(rand.uniform(1, 20) for _ in range(200))
+    positions, enclosing = _layout.pack(radii)
+    for (xa, ya), ra in zip(positions, radii):
+        assert math.hypot(xa, ya) + ra <= enclosing + 1e-9
+    for idx, ((xa, ya), ra) in enumerate(zip(positions, radii)):
+        for (xb, yb), rb in zip(positions[idx+1:], radii[idx+1:]):
+            assert math.hypot(xa - xb, ya - yb) >= ra + rb - 1e-9
+
+
+def test_packing_layout(tree, tmp_path):
+    positions = _layout.circle_packing(tree, node_radius=10, padding=5)
+    assert set(positions) == set(tree.inclusions)
+    nodes = tuple(tree.nodes())
+    assert len({positions[node] for node in nodes}) == len(nodes)
+    bblfile = tmp_path / 'graph.bbl'
+    bblfile.write_text('\n'.join(BUBBLE_LINES))
+    lines = tuple(_js.bbl_to_cys(str(bblfile), layout='packing'))
+    assert "    name: 'preset',  // positions are given by the elements" in lines
+    nodes = [json.loads(line.strip().rstrip(',')) for line in lines
+             if line.strip().startswith('{"group":"nodes"')]
+    assert len(nodes) == 7 and all('position' in node for node in nodes)
+    with pytest.raises(ValueError):
+        tuple(_js.bbl_to_cys(str(bblfile), layout='unknown'))
+
+
+@pytest.mark.parametrize('lines, oriented', [
+    (BUBBLE_LINES, False),
+    (BUBBLE_LINES, True),
+    (BUBBLE_LINES + ('IN\tk\tp2', 'EDGE\tp2\tp2\t1.0'), False),  # overlapping powernodes
+    (BUBBLE_LINES + ('IN\tk\tp2', 'EDGE\tp2\tp2\t1.0'), True),
+])
+def test_edgelist(tmp_path, lines, oriented):
+    tree = BubbleTree.from_bubble_lines(lines, oriented=oriented)
+    expected = set(tree.initial_edges())
+    if not oriented:
+        expected = {frozenset(edge) for edge in expected}
+    edges = tuple(_edgelist.edges(tree))
+    assert len(edges) == len(expected)
+    assert {edge if oriented else frozenset(edge) for edge in edges} == expected
+    for outfile in ('edges.tsv', 'edges.tsv.gz'):
+        assert converter.tree_to_edgelist(tree, str(tmp_path / outfile)) == str(tmp_path / outfile)
+    assert (tmp_path / 'edges.tsv').read_text() == ''.join(map('{}\t{}\n'.format, *zip(*edges)))
+    with gzip.open(str(tmp_path / 'edges.tsv.gz'), 'rt') as fd:
+        assert fd.read() == (tmp_path / 'edges.tsv').read_text()
+    names, indptr, indices = _edgelist.csr_arrays(tree)
+    assert sorted(names) == sorted(tree.nodes())
+    matrix = {(names[row], names[col]) for row in range(len(names))
+              for col in indices[indptr[row]:indptr[row+1]]}
+    assert matrix == set(tree.initial_edges()) | (set() if oriented else {
+        (target, source) for source, target in tree.initial_edges()})
+
+
+def test_edgelist_npz(tree, tmp_path):
+    sparse = pytest.importorskip('scipy.sparse')
+    numpy = pytest.importorskip('numpy')
+    outfile = str(tmp_path / 'edges.npz')
+    converter.tree_to_edgelist(tree, outfile)
+    matrix = sparse.load_npz(outfile)
+    names = tuple(numpy.load(outfile)['names'])
+    assert matrix.nnz == 2 * tree.init_edge_number()
+    assert matrix[names.index('k'), names.index('a')] and matrix[names.index('a'), names.index('k')]
+
+
+def test_edgelist_compression(tmp_path):
+    edgefile, bblfile = str(tmp_path / 'edges.tsv.gz'), str(tmp_path / 'graph.bbl')
+    with gzip.open(edgefile, 'wt') as fd:
+        fd.write('# biclique and a pending node\n\n')
+        fd.writelines('{}\t{}\t1.0\n'.format(a, b) for a in 'abc' for b in 'defg')
+        fd.write('g\th\n')
+    assert converter.edgelist_to_bubble(edgefile, bblfile) == bblfile
+    tree = BubbleTree.from_bubble_file(bblfile)
+    assert tree.edge_number() == 3
+    assert {frozenset(edge) for edge in tree.initial_edges()} == {
+        frozenset(edge) for edge in _edgelist.edges_from_file(edgefile)}
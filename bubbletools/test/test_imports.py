@@ -0,0 +1,50 @@
+"""Guard the import time of the package, paid by each CLI run"""
+
+import os
+import sys
+import json
+import subprocess
+
+import bubbletools
+
+
+IMPORT_BUDGET = 0.25  # seconds, for the import of the package and validator
+HEAVY_MODULES = ('graphviz', 'pkg_resources', 'bubbletools._js', 'bubbletools._gexf')
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(bubbletools.__file__)))
+
+
+def run_python(code:str) -> str:
+    return subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIR, check=True,
+                          stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+
+def test_no_heavy_import():
+    modules = json.loads(run_python(
+        'import sys, json, bubbletools\n'
+        'from bubbletools import validator, converter, BubbleTree\n'
+        'print(json.dumps(sorted(sys.modules)))'
+    ))
+    assert not set(HEAVY_MODULES) & set(modules)
+
+
+def test_lazy_attributes():
+    assert bubbletools.BubbleTree.__name__ == 'BubbleTree'
+    assert bubbletools.convert.bubble_to_dot
+    assert callable(bubbletools.validate)
+    assert {'BubbleTree', 'convert', 'validate'} <= set(dir(bubbletools))
+    try:
+        bubbletools.missing
+    except AttributeError:
+        pass
+    else:
+        assert False, 'missing attribute should raise AttributeError'
+
+
+def test_import_time():
+    durations = [float(run_python(
+        'import time\n'
+        'start = time.perf_counter()\n'
+        'import bubbletools.validator\n'
+        'print(time.perf_counter() - start)'
+    )) for _ in range(3)]
+    assert min(durations) < IMPORT_BUDGET, durations
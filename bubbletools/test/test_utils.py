@@ -1,5 +1,6 @@
 
 
+import re
 import pytest
 
 from bubbletools import utils
@@ -33,6 +34,41 @@ def test_line_type():
     assert lt(' hi !') == 'ERROR'
 
 
+def test_line_record_matches_line_types():
+    lines = (
+        'EDGE\ta\tb\t1.0', 'EDGE\ta\tb\t.5', 'EDGE\ta\tb\t1.', 'EDGE\ta\tb',
+        'EDGE\ta\t\t1.0', 'EDGE\ta b\tc\t2', 'SET\tp1\t1.0', 'SET\tp1',
+        'IN\ta\tb', 'IN\ta\tb\tc', 'IN\ta\t', 'NODE\ta', 'NODE\t', 'NODE\ta\tb',
+        'NODE', '', '   ', '\t', ' # hi', '#', 'EDGE#', 'this is not bubble',
+        'FALSEDGE\ta\tb', 'FALSEDGE\ta', 'FALSEPOWEREDGE\tp1\tp2\ta\tb',
+        'FALSEPOWEREDGE\tp1\tp2\ta',
+    )
+    for line in lines:
+        for regex, ltype in utils.LINE_TYPES.items():
+            match = re.fullmatch(regex, line)
+            if match:
+                break
+        record = utils.line_record(line)
+        assert record[0] == ltype, line
+        assert utils.line_data(line) == match.groups(), line
+        assert tuple(utils.line_records([line])) == (record,)
+
+
+def test_file_records(tmp_path):
+    lines = ('# comment', 'NODE\tk', '', 'IN\ta\tp1', 'SET\tp1\t1.0  ',
+             'EDGE\tk\tp1\t1.0', 'not bubble', '  ', 'IN\tb\tp1')
+    bblfile = tmp_path / 'test.bbl'
+    bblfile.write_bytes('\r\n'.join(lines).encode())
+    expected = tuple(utils.line_records(utils.file_lines(str(bblfile))))
+    assert expected[0] == ('COMMENT',)
+    assert len(expected) == 7
+    for chunk_size in (1, 3, 7, 1024):
+        for use_mmap in (False, True):
+            records = utils.file_records(str(bblfile), chunk_size=chunk_size,
+                                         use_mmap=use_mmap)
+            assert tuple(records) == expected
+
+
 def test_walk():
     grapha = utils.completed_graph({
         1: {11, 12, 13},
@@ -58,3 +94,19 @@ def test_walk():
 def test_have_cycle():
     assert utils.have_cycle({1: {2, 3}, 2: {3}}) == set()
     assert utils.have_cycle({1: {2}, 2: {3}, 3: {1}}) == {1, 2, 3}
+
+
+def test_have_cycle_long_chain():
+    chain = {idx: {idx+1} for idx in range(100000)}
+    assert utils.have_cycle(chain) == set()
+    chain[100000] = {50000}
+    assert utils.have_cycle(chain) == set(range(50000, 100001))
+
+
+def test_cycles():
+    graph = {1: {2}, 2: {3}, 3: {1, 4}, 4: {5}, 5: {4, 6}, 6: {6}, 7: {1}}
+    assert set(utils.cycles(graph)) == {frozenset({1, 2, 3}), frozenset({4, 5}), frozenset({6})}
+    assert utils.cycles({1: {2, 3}, 2: {3}}) == ()
+    chain = {idx: {idx+1} for idx in range(100000)}
+    chain[100000] = {0}
+    assert utils.cycles(chain) == (frozenset(range(100001)),)
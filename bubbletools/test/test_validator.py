@@ -1,4 +1,4 @@
-
+import ast
 
 from bubbletools import validator
 
@@ -91,3 +91,88 @@ def test_validate_mergability():
     }
     result = tuple(validator.validate(data, profiling=True))
     assert set(result) == expected
+
+
+def test_validate_overlap():
+    data = (
+        "IN	a	p1",
+        "IN	b	p1",
+        "IN	b	p2",
+        "IN	c	p2",
+        "IN	p2	p3",
+        "IN	d	p3",
+    )
+    result = tuple(log for log in validator.validate(data) if log.startswith('ERROR'))
+    assert set(result) == {
+        "ERROR overlapping powernodes: 1 nodes are shared by p1 and p2,"
+        " which are not in inclusion. Shared nodes are {'b'}",
+        "ERROR overlapping powernodes: 1 nodes are shared by p1 and p3,"
+        " which are not in inclusion. Shared nodes are {'b'}",
+    }
+
+
+def test_validate_overlap_below_common_ancestors():
+    chain = tuple("IN\tq{}\tq{}".format(idx, idx + 1) for idx in range(50))
+    data = chain + (
+        "IN\tp1\tq0", "IN\tp2\tq0", "IN\tp3\tp2",
+        "IN\ta\tp1", "IN\tb\tp1", "IN\tb\tp3", "IN\tc\tp3",
+    )
+    result = tuple(log for log in validator.validate(data) if log.startswith('ERROR'))
+    assert len(result) == 2 and set(result) == {
+        "ERROR overlapping powernodes: 1 nodes are shared by p2 and p1,"
+        " which are not in inclusion. Shared nodes are {'b'}",
+        "ERROR overlapping powernodes: 1 nodes are shared by p1 and p3,"
+        " which are not in inclusion. Shared nodes are {'b'}",
+    }
+
+
+def test_validate_overlap_through_empty_powernode():
+    data = ("IN\tx\tp1", "IN\tp3\tp1", "IN\ty\tp2", "IN\tp3\tp2", "SET\tp3\t1.0")
+    result = tuple(log for log in validator.validate(data) if log.startswith('ERROR'))
+    assert result == (
+        "ERROR overlapping powernodes: 1 nodes are shared by p1 and p2,"
+        " which are not in inclusion. Shared nodes are {'p3'}",
+    )
+
+
+def test_validate_overlap_with_nested_leaves():
+    data = ("IN\ta\tp1", "IN\tp3\tp1", "IN\tp3\tp2", "IN\tq\tp2",
+            "IN\tb\tp3", "SET\tq\t1.0")
+    result = tuple(log for log in validator.validate(data) if log.startswith('ERROR'))
+    assert len(result) == 1
+    message, shared = result[0].split(' Shared nodes are ')
+    assert message == ("ERROR overlapping powernodes: 2 nodes are shared by p1 and p2,"
+                       " which are not in inclusion.")
+    assert ast.literal_eval(shared) == {'p3', 'b'}
+
+
+def test_mergeability_neighbor_cap():
+    tree = validator.BubbleTree.from_bubble_lines((
+        "EDGE	a	hub	1.0",
+        "EDGE	b	hub	1.0",
+        "EDGE	c	hub	1.0",
+        "EDGE	a	x	1.0",
+        "EDGE	b	x	1.0",
+    ))
+    warnings = tuple(validator.mergeability_validation(tree))
+    assert 'WARNING mergeable nodes: a and b are both roots, and share 2 neigbors' in warnings
+    assert len(warnings) == 4  # (a, b), (a, c), (b, c), (hub, x)
+    warnings = tuple(validator.mergeability_validation(tree, neighbor_cap=2))
+    assert set(warnings) == {
+        'WARNING mergeable nodes: a and b are both roots, and share 1 neigbor',
+        'WARNING mergeable nodes: hub and x are both roots, and share 2 neigbors',
+    }
+    warnings = tuple(log for log in validator.validate((
+        "EDGE\ta\thub\t1.0", "EDGE\tb\thub\t1.0", "EDGE\tc\thub\t1.0",
+    ), neighbor_cap=2) if log.startswith('WARNING'))
+    assert warnings == ()
+
+
+def test_mergeability_raised_neighbor_cap():
+    tree = validator.BubbleTree.from_bubble_lines(
+        "EDGE\t{}\thub\t1.0".format(node) for node in 'abcd')
+    assert tuple(validator.mergeability_validation(tree, neighbor_cap=3)) == ()
+    warnings = tuple(validator.mergeability_validation(tree, neighbor_cap=4))
+    assert len(warnings) == 6  # all pairs of a, b, c and d, linked only through hub
+    assert 'WARNING mergeable nodes: a and d are both roots, and share 1 neigbor' in warnings
+    assert set(validator.mergeability_validation(tree)) == set(warnings)
@@ -1,8 +1,12 @@
 """Various functions"""
 
+import os
 import re
+import math
+import heapq
+import mmap
 import itertools as it
-from collections import defaultdict, OrderedDict
+from collections import defaultdict, OrderedDict, Counter, deque
 
 
 LINE_TYPES = OrderedDict((
@@ -10,10 +14,31 @@ LINE_TYPES = OrderedDict((
     (r'(SET)\t([^\t]+)\t[0-9]*\.?[0-9]+', 'SET'),
     (r'(IN)\t([^\t]+)\t([^\t]+)', 'IN'),
     (r'(NODE)\t([^\t]+)', 'NODE'),
+    # extended format, used to describe the false edges of a lossy compression
+    (r'(FALSEDGE)\t([^\t]+)\t([^\t]+)', 'FALSEDGE'),
+    (r'(FALSEPOWEREDGE)\t([^\t]+)\t([^\t]+)\t([^\t]+)\t([^\t]+)', 'FALSEPOWEREDGE'),
     (r'\s*#.*', 'COMMENT'),
     (r'\s*', 'EMPTY'),
     (r'.*', 'ERROR'),
 ))
+# tokenizer equivalent of LINE_TYPES: number of tab-separated fields
+#  and presence of a trailing weight for each payload line type.
+_PAYLOAD_FIELDS = {
+    'EDGE': (4, True),
+    'SET': (3, True),
+    'IN': (3, False),
+    'NODE': (2, False),
+    'FALSEDGE': (3, False),
+    'FALSEPOWEREDGE': (5, False),
+}
+_NUMBER_REGEX = re.compile(r'[0-9]*\.?[0-9]+')
+_COMMENT_REGEX = re.compile(r'\s*#.*')
+_EMPTY_REGEX = re.compile(r'\s*')
+_ERROR_REGEX = re.compile(r'.*')
+# same for raw lines read from files
+_BYTES_PAYLOAD_FIELDS = {ltype.encode(): spec for ltype, spec in _PAYLOAD_FIELDS.items()}
+_BYTES_NUMBER_REGEX = re.compile(_NUMBER_REGEX.pattern.encode())
+CHUNK_SIZE = 2 ** 20  # number of bytes read at once in bubble files
 
 
 def infer_format(filename:str) -> str:
@@ -51,42 +76,352 @@ def walk(start:list, graphs:iter) -> iter:
     """
     walked = set([start])
     stack = [start]
-    while len(stack) > 0:
-        *stack, curr = stack
+    while stack:
+        curr = stack.pop()
         yield curr
         succs = it.chain.from_iterable(graph.get(curr, ()) for graph in graphs)
         for succ in succs:
             if succ not in walked:
-                walked.add(curr)
+                walked.add(succ)
                 stack.append(succ)
 
 
+def component_representatives(graphs:iter) -> dict:
+    """Return the mapping node -> representative node of its connected
+    component, for all nodes found in given graphs.
+
+    All graph are understood as a single undirected one,
+    with merged keys and values. Components are computed with
+    a union-find, in time quasi-linear with the number of links.
+
+    >>> reprs = component_representatives(({1: {2}, 3: ()}, {2: {1}, 4: {3, 5}}))
+    >>> reprs[1] == reprs[2], reprs[3] == reprs[4] == reprs[5], reprs[1] == reprs[3]
+    (True, True, False)
+
+    """
+    parent, size = {}, {}  # node -> parent node, representative -> component size
+    def find(node):
+        "Return the representative of given node, halving its path to it"
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+    for graph in graphs:
+        for node, succs in graph.items():
+            if node not in parent:
+                parent[node], size[node] = node, 1
+            root = find(node)
+            for succ in succs:
+                if succ not in parent:  # a new node: it joins the component
+                    parent[succ] = root
+                    size[root] += 1
+                    continue
+                other = find(succ)
+                if other != root:  # union by size
+                    if size[root] < size[other]:
+                        root, other = other, root
+                    parent[other] = root
+                    size[root] += size.pop(other)
+    return {node: find(node) for node in parent}
+
+
+def maximal_intervals(*intervals:iter) -> tuple:
+    """Return the intervals of given iterables, sorted by start,
+    that are not contained by another one.
+
+    Each iterable must yield (start, stop, *data) tuples sorted by start,
+    and any two intervals must be either nested or disjoint,
+    as the intervals of a depth-first walk of a tree.
+
+    >>> maximal_intervals([(0, 9, 'a'), (10, 11, 'b')], [(1, 2, 'c'), (12, 15, 'd')])
+    ((0, 9, 'a'), (10, 11, 'b'), (12, 15, 'd'))
+
+    """
+    maximals, last_stop = [], None
+    for interval in heapq.merge(*intervals):
+        if last_stop is None or interval[0] > last_stop:
+            maximals.append(interval)
+            last_stop = interval[1]
+    return tuple(maximals)
+
+
+class HyperLogLog:
+    """Cardinality sketch of a set of hashable objects, using 2**precision
+    one-byte registers, with a relative standard error of
+    about 1.04 / sqrt(2**precision).
+
+    Sketches of unions are obtained by merging sketches,
+    so overlapping sets are never counted twice.
+
+    >>> sketch = HyperLogLog()
+    >>> sketch.update(range(100))
+    >>> round(sketch.cardinality())
+    101
+    >>> other = HyperLogLog.of(range(50, 150))
+    >>> round(sketch.merged(other).cardinality())
+    150
+
+    """
+    _INVERSE_POWERS = tuple(2. ** -rank for rank in range(65))
+
+    def __init__(self, precision:int=12, registers:bytearray=None):
+        if not 4 <= precision <= 16:
+            raise ValueError("Precision must be in [4;16], not {}.".format(precision))
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(2 ** precision)
+        self._cardinality = None  # computed on time
+
+    @staticmethod
+    def of(items:iter, precision:int=12) -> 'HyperLogLog':
+        """Return the sketch of given items"""
+        sketch = HyperLogLog(precision)
+        sketch.update(items)
+        return sketch
+
+    def add(self, item):
+        """Add given hashable object to the sketch"""
+        # mix the bits of python hash, which is the identity for small integers
+        h = hash(item) & 0xFFFFFFFFFFFFFFFF
+        h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & 0xFFFFFFFFFFFFFFFF
+        h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & 0xFFFFFFFFFFFFFFFF
+        h ^= h >> 31
+        width = 64 - self.precision
+        index, rank = h >> width, width - (h & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            self._cardinality = None
+
+    def update(self, items:iter):
+        """Add given hashable objects to the sketch"""
+        for item in items:
+            self.add(item)
+
+    def copy(self) -> 'HyperLogLog':
+        """Return an independent copy of the sketch"""
+        return HyperLogLog(self.precision, bytearray(self.registers))
+
+    def merged(self, other:'HyperLogLog') -> 'HyperLogLog':
+        """Return the sketch of the union of the sets sketched
+        by this sketch and given one"""
+        if other.precision != self.precision:
+            raise ValueError("Sketches of different precisions can't be merged.")
+        return HyperLogLog(self.precision, bytearray(map(max, self.registers, other.registers)))
+
+    def cardinality(self) -> float:
+        """Return the estimated number of distinct objects added to the sketch.
+
+        The estimation is kept until the next addition.
+
+        """
+        if self._cardinality is None:
+            self._cardinality = self._estimate()
+        return self._cardinality
+
+    def _estimate(self) -> float:
+        """Return the HyperLogLog estimation, with linear counting for small ranges"""
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(map(self._INVERSE_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:  # small range: linear counting
+            return size * math.log(size / zeros)
+        return estimate
+
+
 def have_cycle(graph:dict) -> frozenset:
     """Perform a topologic sort to detect any cycle.
 
     Return the set of unsortable nodes. If at least one item,
     then there is cycle in given graph.
 
+    The sort is Kahn's algorithm, linear in the size of the graph.
+    Unsortable nodes are the nodes in cycles and the nodes below them.
+    See cycles function to get the cycles themselves.
+
     """
-    # topological sort
-    walked = set()  # walked nodes
     nodes = frozenset(it.chain(it.chain.from_iterable(graph.values()), graph.keys()))  # all nodes of the graph
-    preds = reversed_graph(graph)  # succ: preds
-    last_walked_len = -1
-    while last_walked_len != len(walked):
-        last_walked_len = len(walked)
-        for node in nodes - walked:
-            if len(preds.get(node, set()) - walked) == 0:
-                walked.add(node)
+    indegree = Counter(it.chain.from_iterable(graph.values()))
+    queue = deque(node for node in nodes if not indegree[node])
+    walked = set()  # sorted nodes
+    while queue:
+        node = queue.popleft()
+        walked.add(node)
+        for succ in graph.get(node, ()):
+            indegree[succ] -= 1
+            if indegree[succ] == 0:
+                queue.append(succ)
     return frozenset(nodes - walked)
 
 
+def strongly_connected_components(graph:dict) -> iter:
+    """Yield the strongly connected components of given graph, as frozensets.
+
+    Iterative implementation of Tarjan's algorithm, linear in the size
+    of the graph, and not limited by the recursion limit.
+    Components are yielded in reverse topological order.
+
+    >>> sorted(map(sorted, strongly_connected_components({1: {2}, 2: {1, 3}})))
+    [[1, 2], [3]]
+
+    """
+    index, lowlink = {}, {}  # node -> discovery time, lowest reachable time
+    stack, on_stack = [], set()  # nodes of the components being built
+    for start in it.chain(graph.keys(), it.chain.from_iterable(graph.values())):
+        if start in index: continue
+        index[start] = lowlink[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(graph.get(start, ())))]  # explicit call stack
+        while work:
+            node, succs = work[-1]
+            for succ in succs:
+                if succ not in index:  # walk it before the other successors
+                    index[succ] = lowlink[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(graph.get(succ, ()))))
+                    break
+                elif succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index[succ])
+            else:  # all successors have been walked
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:  # node is the root of a component
+                    component = set()
+                    while node not in component:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                    yield frozenset(component)
+
+
+def cycles(graph:dict) -> tuple:
+    """Return the cycles of given graph, as a tuple of frozensets
+    of nodes, one for each strongly connected component containing a cycle.
+
+    >>> cycles({1: {2}, 2: {1, 3}, 3: {4}, 4: {4}}) == (frozenset({4}), frozenset({1, 2}))
+    True
+
+    """
+    return tuple(component for component in strongly_connected_components(graph)
+                 if len(component) > 1 or next(iter(component)) in graph.get(next(iter(component)), ()))
+
+
 def file_lines(bblfile:str) -> iter:
     """Yield lines found in given file"""
     with open(bblfile) as fd:
         yield from (line.rstrip() for line in fd if line.rstrip())
 
 
+def line_record(line:str) -> tuple:
+    """Return the record describing given line, as a tuple (type, *payload).
+
+    Payload is the groups captured by LINE_TYPES for EDGE, SET, IN, NODE,
+    FALSEDGE and FALSEPOWEREDGE lines, nothing for COMMENT and EMPTY lines, and the line itself
+    for ERROR lines. Only one split and one dictionary lookup are
+    necessary for payload lines, the regexes being reserved to the others.
+
+    >>> line_record('IN\\ta\\tb')
+    ('IN', 'a', 'b')
+    >>> line_record('EDGE\\ta\\tb\\t1.0')
+    ('EDGE', 'a', 'b')
+    >>> line_record('# comment')
+    ('COMMENT',)
+    >>> line_record('EDGE\\ta')
+    ('ERROR', 'EDGE\\ta')
+
+    """
+    fields = line.split('\t')
+    ltype = fields[0]
+    spec = _PAYLOAD_FIELDS.get(ltype)
+    if spec and len(fields) == spec[0] and all(fields):
+        if not spec[1]:
+            return tuple(fields)
+        if _NUMBER_REGEX.fullmatch(fields[-1]):
+            return tuple(fields[:-1])
+    if _COMMENT_REGEX.fullmatch(line):
+        return 'COMMENT',
+    if _EMPTY_REGEX.fullmatch(line):
+        return 'EMPTY',
+    if _ERROR_REGEX.fullmatch(line):
+        return 'ERROR', line
+    raise ValueError("Input line \"{}\" is not bubble formatted".format(line))
+
+
+def line_records(lines:iter) -> iter:
+    """Yield records of given lines, as given by line_record"""
+    yield from map(line_record, lines)
+
+
+def file_chunks(bblfile:str, chunk_size:int=CHUNK_SIZE,
+                use_mmap:bool=False) -> iter:
+    """Yield the content of given file as bytes, by chunks of given size.
+
+    use_mmap -- read the file through a memory map instead of read calls
+
+    """
+    with open(bblfile, 'rb') as fd:
+        if use_mmap and os.fstat(fd.fileno()).st_size:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for start in range(0, len(mm), chunk_size):
+                    yield mm[start:start+chunk_size]
+        else:
+            yield from iter(lambda: fd.read(chunk_size), b'')
+
+
+def file_records(bblfile:str, chunk_size:int=CHUNK_SIZE,
+                 use_mmap:bool=False) -> iter:
+    """Yield records of non empty lines found in given file,
+    as given by line_record.
+
+    The file is read by binary chunks, and only the payload fields
+    are decoded, so that memory usage does not depend of the file size.
+
+    """
+    rest = b''
+    for chunk in file_chunks(bblfile, chunk_size, use_mmap=use_mmap):
+        lines = chunk.split(b'\n')
+        lines[0] = rest + lines[0]
+        rest = lines.pop()
+        yield from filter(None, map(_bytes_line_record, lines))
+    if rest.strip():
+        yield _bytes_line_record(rest)
+
+
+def split_false_edges(records:iter, false_records:list) -> iter:
+    """Yield given records, except the ones of FALSEDGE and FALSEPOWEREDGE
+    lines, that are appended to given list.
+
+    >>> false_records = []
+    >>> tuple(split_false_edges([('IN', 'a', 'p'), ('FALSEDGE', 'a', 'b')], false_records))
+    (('IN', 'a', 'p'),)
+    >>> false_records
+    [('FALSEDGE', 'a', 'b')]
+
+    """
+    for record in records:
+        if record[0] in {'FALSEDGE', 'FALSEPOWEREDGE'}:
+            false_records.append(record)
+        else:
+            yield record
+
+
+def _bytes_line_record(line:bytes) -> tuple or None:
+    """Return the record describing given raw line, as line_record does,
+    or None if the line is empty."""
+    line = line.rstrip()
+    fields = line.split(b'\t')
+    spec = _BYTES_PAYLOAD_FIELDS.get(fields[0])
+    if spec and len(fields) == spec[0] and all(fields):
+        if not spec[1]:
+            return tuple(field.decode() for field in fields)
+        if _BYTES_NUMBER_REGEX.fullmatch(fields[-1]):
+            return tuple(field.decode() for field in fields[:-1])
+    return line_record(line.decode()) if line else None
+
+
 def line_type(line:str) -> str:
     """Give type of input line, as defined in LINE_TYPES
 
@@ -96,10 +431,7 @@ def line_type(line:str) -> str:
     'EMPTY'
 
     """
-    for regex, ltype in LINE_TYPES.items():
-        if re.fullmatch(regex, line):
-            return ltype
-    raise ValueError("Input line \"{}\" is not bubble formatted".format(line))
+    return line_record(line)[0]
 
 
 def line_data(line:str) -> tuple:
@@ -111,11 +443,8 @@ def line_data(line:str) -> tuple:
     ()
 
     """
-    for regex, _ in LINE_TYPES.items():
-        match = re.fullmatch(regex, line)
-        if match:
-            return match.groups()
-    raise ValueError("Input line \"{}\" is not bubble formatted".format(line))
+    record = line_record(line)
+    return record if record[0] in _PAYLOAD_FIELDS else ()
 
 
 def data_from_bubble(bblfilename:str) -> iter:
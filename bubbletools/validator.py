@@ -2,16 +2,17 @@
 
 import os
 import itertools as it
-from collections import Counter
+from collections import Counter, defaultdict
 
 from bubbletools.bbltree import BubbleTree
 from bubbletools import utils
 
 
-def validate(bbllines:iter, *, profiling=False):
+def validate(bbllines:iter, *, profiling=False, neighbor_cap:int=None):
     """Yield lines of warnings and errors about input bbl lines.
 
     profiling -- yield also info lines about input bbl file.
+    neighbor_cap -- see mergeability_validation.
 
     If bbllines is a valid file name, it will be read.
     Else, it should be an iterable of bubble file lines.
@@ -19,15 +20,16 @@ def validate(bbllines:iter, *, profiling=False):
     """
     if isinstance(bbllines, str):
         if os.path.exists(bbllines):  # filename containing bubble
-            bbllines = utils.file_lines(bbllines)
+            records = utils.file_records(bbllines)
         elif '\n' not in bbllines or '\t' not in bbllines:
             # probably a bad file name: let's rise the proper error
-            bbllines = utils.file_lines(bbllines)
+            records = utils.file_records(bbllines)
         else:  # bubble itself
-            bbllines = bbllines.split('\n')
-    bubble = tuple(bbllines)
-    data = tuple(utils.line_data(line) for line in bubble)
-    types = tuple(utils.line_type(line) for line in bubble)
+            records = utils.line_records(bbllines.split('\n'))
+    else:
+        records = utils.line_records(bbllines)
+    records = tuple(records)
+    types = tuple(record[0] for record in records)
     # launch profiling
     if profiling:
         ltype_counts = Counter(types)
@@ -37,9 +39,9 @@ def validate(bbllines:iter, *, profiling=False):
             ltype_counts['EDGE'] + ltype_counts['IN'] +
             ltype_counts['NODE'] + ltype_counts['SET'])
     # launch validation
-    for errline in (l for l, t in zip(bubble, types) if t == 'ERROR'):
+    for _, errline in (r for r in records if r[0] == 'ERROR'):
         yield 'ERROR line is not bubble: "{}"'.format(errline)
-    tree = BubbleTree.from_bubble_data(data)
+    tree = BubbleTree.from_bubble_data(records)
     cc, subroots = tree.connected_components()
     # print('cc:', cc)
     # print('subroots:', subroots)
@@ -52,26 +54,41 @@ def validate(bbllines:iter, *, profiling=False):
             ltype_counts['SET'], len(tuple(tree.powernodes())))
 
     yield from inclusions_validation(tree)
-    yield from mergeability_validation(tree)
+    yield from mergeability_validation(tree, neighbor_cap=neighbor_cap)
 
 
 def inclusions_validation(tree:BubbleTree) -> iter:
     """Yield message about inclusions inconsistancies"""
-    # search for powernode overlapping
-    for one, two in it.combinations(tree.inclusions, 2):
-        assert len(one) == len(one.strip())
-        assert len(two) == len(two.strip())
-        one_inc = set(included(one, tree.inclusions))
-        two_inc = set(included(two, tree.inclusions))
+    # search for powernode overlapping.
+    # Two powernodes sharing (power)nodes without being in inclusion
+    #  are either both in the same inclusion cycle, or above a (power)node
+    #  with many direct parents, each on the chain of parents
+    #  of a different direct parent, below the point where these chains meet.
+    #  Only these pairs need to be checked.
+    above = {}  # powernode -> itself and its ancestors
+    def chain(powernode:str) -> set:
+        if powernode not in above:
+            above[powernode] = {powernode, *tree.ancestors(powernode)}
+        return above[powernode]
+    candidates = set()
+    for parents in tree.parents.values():
+        for one, two in it.combinations(parents, 2):
+            one_chain, two_chain = chain(one), chain(two)
+            candidates.update(it.product(one_chain - two_chain, two_chain - one_chain))
+    for cycle in utils.cycles(tree.inclusions):
+        candidates.update(it.combinations(cycle, 2))
+    # report them in the order of the inclusions keys
+    order = {name: idx for idx, name in enumerate(tree.inclusions)}
+    pairs = sorted({tuple(sorted(pair, key=order.get)) for pair in candidates},
+                   key=lambda pair: (order[pair[0]], order[pair[1]]))
+    contained = {}  # powernode -> set of (power)nodes below it
+    def included_set(powernode:str) -> set:
+        if powernode not in contained:
+            contained[powernode] = set(tree.all_in(powernode))
+        return contained[powernode]
+    for one, two in pairs:
+        one_inc, two_inc = included_set(one), included_set(two)
         common_inc = one_inc & two_inc
-        if len(common_inc) == one_inc:
-            if not two in one_inc:
-                yield ("ERROR inconsistency in inclusions: {} is both"
-                       " included and not included in {}.".format(two, one))
-        if len(common_inc) == two_inc:
-            if not one in two_inc:
-                yield ("ERROR inconsistency in inclusions: {} is both"
-                       " included and not included in {}.".format(one, two))
         if len(common_inc) > 0:  # one and two are not disjoint
             if len(common_inc) == len(one_inc) or len(common_inc) == len(two_inc):
                 # one is included in the other
@@ -117,23 +134,45 @@ def included(powernode:str, inclusions:dict, nodes_only=False) -> iter:
                 if condition(elem))
 
 
-def mergeability_validation(tree:BubbleTree) -> iter:
-    """Yield message about mergables powernodes"""
-    def gen_warnings(one, two, inc_message:str) -> [str]:
-        "Yield the warning for given (power)nodes if necessary"
+def mergeability_validation(tree:BubbleTree, neighbor_cap:int=None) -> iter:
+    """Yield message about mergables powernodes
+
+    Siblings (roots, or (power)nodes under the same powernode) are mergeable
+    if they share neighbors. Pairs of siblings are found by grouping them
+    by neighbor, so only pairs sharing at least one neighbor are considered.
+
+    neighbor_cap -- if given, ignore neighbors linked to more than
+                    neighbor_cap siblings, for speed. Siblings sharing
+                    only such neighbors are never compared, so they are
+                    not reported, and the shared neighbor counts of the
+                    reported ones leave these neighbors out.
+
+    """
+    def gen_warnings(one, two, nb_shared:int, inc_message:str) -> [str]:
+        "Yield the warning for given (power)nodes"
         nodetype = ''
         if tree.inclusions[one] and tree.inclusions[two]:
             nodetype = 'power'
         elif tree.inclusions[one] or tree.inclusions[two]:
             nodetype = '(power)'
         if one > two:  one, two = two, one
-        shared = set(tree.edges.get(one, ())) & set(tree.edges.get(two, ()))
-        if shared:
-            yield (f"WARNING mergeable {nodetype}nodes: {one} and {two}"
-                   f" are {inc_message}, and share"
-                   f" {len(shared)} neigbor{'s' if len(shared) > 1 else ''}")
-    for one, two in it.combinations(tree.roots, 2):
-        yield from gen_warnings(one, two, inc_message='both roots')
+        yield (f"WARNING mergeable {nodetype}nodes: {one} and {two}"
+               f" are {inc_message}, and share"
+               f" {nb_shared} neigbor{'s' if nb_shared > 1 else ''}")
+    def gen_level_warnings(siblings:tuple, inc_message:str) -> [str]:
+        "Yield the warnings for given siblings sharing neighbors"
+        linked_siblings = defaultdict(list)  # neighbor -> siblings linked to it
+        for sibling in siblings:
+            for neighbor in tree.edges.get(sibling, ()):
+                linked_siblings[neighbor].append(sibling)
+        shared = Counter()  # pair of siblings -> number of shared neighbors
+        for linked in linked_siblings.values():
+            if neighbor_cap is None or len(linked) <= neighbor_cap:
+                shared.update(it.combinations(linked, 2))
+        # yield warnings in the order of siblings
+        position = {sibling: idx for idx, sibling in enumerate(siblings)}
+        for one, two in sorted(shared, key=lambda p: (position[p[0]], position[p[1]])):
+            yield from gen_warnings(one, two, shared[one, two], inc_message)
+    yield from gen_level_warnings(tuple(tree.roots), inc_message='both roots')
     for parent, childs in tree.inclusions.items():
-        for one, two in it.combinations(childs, 2):
-            yield from gen_warnings(one, two, inc_message=f'in the same level (under {parent})')
+        yield from gen_level_warnings(tuple(childs), inc_message=f'in the same level (under {parent})')